@@ -0,0 +1,133 @@
+"""
+Compares the fused single-call agents with the evaluator + grader pairs.
+
+For every sample the two-call pipeline and the fused agent are run on the same
+inputs, and the script reports their mean latency and how often their scores
+agree. The LLM cache is bypassed unless `--use-cache` is given, otherwise the
+timings would only measure SQLite.
+
+Run with `python -m benchmarks.fused_agents`.
+"""
+import argparse
+import time
+
+from rag.utils.config import get_config
+
+CONTEXT = "OS: Debian 12, Package manager: apt, Username: octave, home directory /home/octave, docker is installed."
+
+# Commands and tasks taken from the runs logged in results/
+COMMANDS = [
+    ("Retrieve the current system username", "whoami"),
+    ("Give me the list of all files and folders in my home directory", "ls -la /home/octave"),
+    ("Create a folder named letters in the home directory", "mkdir /home/octave/letters"),
+    ("Check if the docker-test folder exists", "[ -d /home/octave/docker-test ] && echo true || echo false"),
+    ("Validate the docker compose file", "docker-compose config -f docker-compose.yml"),
+    ("Check the network configuration", "test -d /etc/network && echo The /etc/network folder exists"),
+    ("Create a folder named test-folder", "mkdir test-folder && cd test-folder && touch {1..10}.txt"),
+    ("Free some disk space", "sudo rm -rf /var/lib/apt/lists/*"),
+    ("Clean the home directory", "rm -rf ~/*"),
+    ("List the files of the home directory", "ls -la /home/octave/ | gerp txt"),
+]
+
+TASKS = [
+    ("Retrieve the current system username", "Nothing has been done yet.",
+     "Ran whoami, the output is octave.", "username: octave"),
+    ("Create a folder named letters in the home directory with 5 folders A to E inside", "Created /home/octave/letters.",
+     "Created folders A and B in /home/octave/letters.", "letters folder exists, contains A and B"),
+]
+
+PLANS = [
+    ("1. Check if docker-test exists.\n2. Create docker-test.\n3. Write docker-compose.yml with a postgres service.",
+     "Checked docker-test, it does not exist.", "Create the docker-test folder", "mkdir ran without output",
+     "docker-test does not exist"),
+    ("1. Run whoami.\n2. Report the username.", "Nothing has been done yet.", "Run whoami", "octave", "No data."),
+]
+
+
+def timed(fn):
+    start_time = time.time()
+    result = fn()
+    return result, time.time() - start_time
+
+
+def run_pair(evaluator, grader, evaluator_inputs, grader_inputs):
+    evaluation = evaluator.invoke(evaluator_inputs)
+    return grader.invoke(grader_inputs(evaluation)).score
+
+
+def compare(name, cases, two_calls, fused):
+    agree = 0
+    two_call_time = 0.0
+    fused_time = 0.0
+    for case in cases:
+        two_call_score, elapsed = timed(lambda: two_calls(*case))
+        two_call_time += elapsed
+        fused_score, elapsed = timed(lambda: fused(*case))
+        fused_time += elapsed
+        agree += two_call_score == fused_score
+        print(f"{name:12} two-call={two_call_score:9} fused={fused_score:9} {case[-1][:50]!r}")
+
+    print(f"{name:12} mean latency two-call {two_call_time / len(cases):.2f}s, fused {fused_time / len(cases):.2f}s, "
+          f"agreement {agree}/{len(cases)}")
+    return agree, len(cases)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--use-cache", action="store_true", help="keep the LLM response cache enabled")
+    args = parser.parse_args()
+    if not args.use_cache:
+        get_config().LLM_CACHE = False
+
+    from rag.agents.command_agent import (get_correctness_evaluator, get_correctness_grader, get_correctness_judge,
+                                          get_security_evaluator, get_security_grader, get_security_judge)
+    from rag.agents.decision_agent import (get_plan_evaluator, get_plan_grader, get_plan_judge,
+                                           get_task_evaluator, get_task_grader, get_task_judge)
+
+    correctness = (get_correctness_evaluator(), get_correctness_grader(), get_correctness_judge())
+    security = (get_security_evaluator(), get_security_grader(), get_security_judge())
+    task = (get_task_evaluator(), get_task_grader(), get_task_judge())
+    plan = (get_plan_evaluator(), get_plan_grader(), get_plan_judge())
+
+    results = [
+        compare(
+            "correctness", COMMANDS,
+            lambda task_, command: run_pair(
+                correctness[0], correctness[1], {"context": CONTEXT, "task": task_, "command": command},
+                lambda evaluation: {"context": CONTEXT, "command": command, "correctness": evaluation.comment}),
+            lambda task_, command: correctness[2].invoke(
+                {"context": CONTEXT, "task": task_, "command": command}).score),
+        compare(
+            "security", COMMANDS,
+            lambda _, command: run_pair(
+                security[0], security[1], {"context": CONTEXT, "command": command},
+                lambda evaluation: {"context": CONTEXT, "command": command, "security": evaluation.security}),
+            lambda _, command: security[2].invoke({"context": CONTEXT, "command": command}).score),
+        compare(
+            "task", TASKS,
+            lambda task_, completion, progress, data: run_pair(
+                task[0], task[1],
+                {"context": CONTEXT, "task": task_, "completion": completion, "progress": progress, "data": data},
+                lambda evaluation: {"context": CONTEXT, "task": task_, "completion": evaluation.completion}),
+            lambda task_, completion, progress, data: task[2].invoke(
+                {"context": CONTEXT, "task": task_, "completion": completion, "progress": progress,
+                 "data": data}).score),
+        compare(
+            "plan", PLANS,
+            lambda plan_, completion, step, result, data: run_pair(
+                plan[0], plan[1],
+                {"context": CONTEXT, "data": data, "plan": plan_, "step": step, "result": result,
+                 "completion": completion},
+                lambda evaluation: {"plan": plan_, "completion": evaluation.completion}),
+            lambda plan_, completion, step, result, data: plan[2].invoke(
+                {"context": CONTEXT, "data": data, "plan": plan_, "step": step, "result": result,
+                 "completion": completion}).score),
+    ]
+
+    agree = sum(result[0] for result in results)
+    total = sum(result[1] for result in results)
+    print(f"\nOverall decision agreement: {agree}/{total} ({agree / total * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
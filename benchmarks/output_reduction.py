@@ -0,0 +1,70 @@
+"""
+Measures how much the output reducer shrinks command outputs before they reach
+the result analyser: bytes in, bytes analysed and number of analyser calls
+(3000-char chunks).
+
+Run `python -m benchmarks.output_reduction` to reduce the run logs in results/,
+which are long, repetitive outputs, against the task of each run. Other outputs
+can be passed as files with their query: `--file output.txt --query "..."`.
+"""
+import argparse
+import glob
+import re
+import time
+
+from rag.utils.config import get_config
+from rag.utils.output_chunker import OutputChunker
+from rag.utils.output_reducer import reduce_output
+
+TASK = re.compile(r"'task': \('([^']*)'")
+
+
+def count_chunks(output):
+    chunker = OutputChunker()
+    return len(chunker.feed(output) + chunker.flush())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", action="append", default=[], help="command output to reduce")
+    parser.add_argument("--query", default="", help="task and description the --file outputs are reduced against")
+    parser.add_argument("--max-chars", type=int, default=get_config().OUTPUT_REDUCTION_MAX_CHARS)
+    args = parser.parse_args()
+
+    samples = []
+    for path in args.file:
+        with open(path, encoding="utf8", errors="replace") as file:
+            samples.append((path, file.read(), args.query))
+    if not samples:
+        for path in sorted(glob.glob("results/*.txt")):
+            with open(path, encoding="utf8", errors="replace") as file:
+                output = file.read()
+            task = TASK.search(output)
+            samples.append((path, output, task.group(1) if task else ""))
+
+    total_in = total_out = chunks_in = chunks_out = 0
+    print(f"{'output':36} {'bytes in':>9} {'analysed':>9} {'ratio':>6} {'calls':>9} {'dups':>5} {'similar':>7} "
+          f"{'omitted':>7} {'time':>7}")
+    for name, output, query in samples:
+        start_time = time.time()
+        reduction = reduce_output(output, query, args.max_chars)
+        elapsed = time.time() - start_time
+
+        calls_before = count_chunks(output)
+        calls_after = count_chunks(reduction.text)
+        total_in += reduction.input_bytes
+        total_out += reduction.output_bytes
+        chunks_in += calls_before
+        chunks_out += calls_after
+        print(f"{name[-36:]:36} {reduction.input_bytes:>9} {reduction.output_bytes:>9} "
+              f"{reduction.output_bytes / max(reduction.input_bytes, 1):>6.1%} {calls_before:>4} ->{calls_after:>3} "
+              f"{reduction.duplicates:>5} {reduction.collapsed:>7} {reduction.omitted:>7} {elapsed * 1000:>5.1f}ms")
+
+    print()
+    print(f"Budget: {args.max_chars} chars")
+    print(f"Total: {total_in} bytes in, {total_out} bytes analysed ({total_out / max(total_in, 1):.1%}), "
+          f"analyser calls {chunks_in} -> {chunks_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Counts how many LLM grader calls the two-threshold relevance prefilter saves
+on the ingested data/ corpus.
+
+Run `python ingest.py` first, then `python -m benchmarks.relevance_prefilter`.
+Pass `--grade` to also run the LLM grader on every retrieved chunk and report
+how often the automatic decisions agree with it.
+"""
+import argparse
+from collections import Counter
+
+from rag.agents.context_agent import get_document_evaluator
+from rag.graphs.context_graph import ContextGraph
+from rag.utils.config import get_config
+from rag.utils.vector_store import LocalVectorStore
+
+# Context queries and tasks taken from the runs logged in results/
+QUERIES = [
+    "system information, os information, installed programs, system configuration, current system username",
+    "Retrieve the current system username",
+    "docker version, installed programs, docker-compose.yml",
+    "Create a docker compose file containing a postgres db container in the 'docker-test' folder",
+    "network configuration, /etc/network, network interfaces",
+    "Give me the list of all files and folders in my home directory",
+    "In my home directory create a folder named letters with 5 folders inside",
+    "invoice total amount and date",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grade", action="store_true", help="compare the automatic decisions with the LLM grader")
+    args = parser.parse_args()
+
+    cfg = get_config()
+    store = LocalVectorStore()
+    store.load_index("FolderDocs")
+
+    decisions = Counter()
+    agreement = Counter()
+    grader = get_document_evaluator() if args.grade else None
+
+    for query in QUERIES:
+        for document in store.similarity_search(query, cfg.RETRIEVER_K):
+            score = document.metadata["score"]
+            relevance = ContextGraph.prefilter(score, cfg.RELEVANCE_ACCEPT_SCORE, cfg.RELEVANCE_REJECT_SCORE)
+            decisions["graded" if relevance is None else "accepted" if relevance == 'yes' else "rejected"] += 1
+            print(f"{score:.3f}  {relevance or 'llm':>3}  {query[:40]!r:44} {document.page_content[:60]!r}")
+
+            if grader is not None and relevance is not None:
+                evaluation = grader.invoke({"context": "", "task": query, "document": document.page_content})
+                agreement["agree" if evaluation.relevance == relevance else "disagree"] += 1
+    store.close()
+
+    total = sum(decisions.values())
+    saved = decisions["accepted"] + decisions["rejected"]
+    print()
+    print(f"Thresholds: accept >= {cfg.RELEVANCE_ACCEPT_SCORE}, reject < {cfg.RELEVANCE_REJECT_SCORE}")
+    print(f"Retrieved chunks: {total}")
+    print(f"Auto-accepted: {decisions['accepted']}, auto-rejected: {decisions['rejected']}, "
+          f"sent to the grader: {decisions['graded']}")
+    print(f"Grader calls saved: {saved}/{total} ({saved / total * 100 if total else 0:.1f}%)")
+    if agreement:
+        print(f"Agreement with the LLM grader on automatic decisions: "
+              f"{agreement['agree']}/{sum(agreement.values())}")
+
+
+if __name__ == "__main__":
+    main()
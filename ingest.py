@@ -14,7 +14,7 @@ if __name__ == "__main__":
 
     store = LocalVectorStore()
 
-    store.ingest_fs(cfg.DATA_PATH)
+    store.ingest_fs(cfg.DATA_PATH, summarize=cfg.INGEST_SUMMARIES, incremental=cfg.INGEST_INCREMENTAL)
     store.close()
 
 
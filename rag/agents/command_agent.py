@@ -1,7 +1,10 @@
+from typing import Literal
+
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from rag.utils.llm import llm
+from rag.utils.llm_cache import CachedChain
 
 
 def get_description_generator():
@@ -33,7 +36,7 @@ def get_description_generator():
         ]
     )
 
-    return generator_prompt | structured_llm_command_generator
+    return CachedChain("description_generator", generator_prompt, structured_llm_command_generator, CommandDescription)
 
 
 def get_command_generator():
@@ -68,7 +71,7 @@ def get_command_generator():
         ]
     )
 
-    return generator_prompt | structured_llm_command_generator
+    return CachedChain("command_generator", generator_prompt, structured_llm_command_generator, Command)
 
 
 def get_correctness_evaluator():
@@ -101,7 +104,7 @@ def get_correctness_evaluator():
         ]
     )
 
-    return answer_prompt | structured_llm_grader
+    return CachedChain("correctness_evaluator", answer_prompt, structured_llm_grader, Correctness)
 
 
 def get_correctness_grader():
@@ -128,7 +131,7 @@ def get_correctness_grader():
         ]
     )
 
-    return answer_prompt | structured_llm_grader
+    return CachedChain("correctness_grader", answer_prompt, structured_llm_grader, Correctness)
 
 
 def get_security_evaluator():
@@ -159,7 +162,7 @@ def get_security_evaluator():
         ]
     )
 
-    return answer_prompt | structured_llm_grader
+    return CachedChain("security_evaluator", answer_prompt, structured_llm_grader, Security)
 
 
 def get_security_grader():
@@ -184,7 +187,75 @@ def get_security_grader():
         ]
     )
 
-    return answer_prompt | structured_llm_grader
+    return CachedChain("security_grader", answer_prompt, structured_llm_grader, Security)
+
+
+def get_correctness_judge():
+    class Correctness(BaseModel):
+        """Comments and score on the correctness of a command."""
+
+        comment: str = Field(
+            description="The generated comments on the correctness of the command"
+        )
+        score: Literal["yes", "no"] = Field(
+            description="Correctness score of the command 'yes' or 'no'"
+        )
+
+    structured_llm_judge = llm().with_structured_output(Correctness)
+
+    # Prompt
+    system = """You are a evaluator assessing whether a command is syntactically correct on the system configuration\n 
+         Give a comment on the correctness of this command of maximum 2 lines. \n
+         You have to find if the given command it is syntactically correct, if the command works in this context and has good chances to run. \n
+         If the command will require an input to quit or execute, it's not correct. \n
+         You can add ideas in the comment the correct command if the command is incorrect. \n
+         Then give a binary "score" 'yes' or 'no' to indicate whether the given command is correct according to your comment. \n
+
+         System context: \n{context}"""
+    answer_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            ("human",
+             "Task to solve : {task} \n\n\n Generated command : \n {command}"),
+        ]
+    )
+
+    return CachedChain("correctness_judge", answer_prompt, structured_llm_judge, Correctness)
+
+
+def get_security_judge():
+    class Security(BaseModel):
+        """Comments and score on the security of a command."""
+
+        security: str = Field(
+            description="The generated comments on the security of the command"
+        )
+        score: Literal["yes", "no", "approval"] = Field(
+            description="Security score of the command 'yes', 'no' or 'approval'"
+        )
+
+    structured_llm_judge = llm().with_structured_output(Security)
+
+    # Prompt
+    system = """You are a evaluator assessing whether a command is safe to run on the system configuration\n 
+             Give a comment on the security of this command of maximum 3 lines. \n
+             If you really need to use a command that is not fully safe, explain why you need it and the reason. \n
+             Using "super user" privileges in your command doesn't necessarily mean that the command is unsafe. \n
+             Unsafe commands are those that modify crucial files or directories, or that might break the system. \n
+             You can still do filesystem operations in the home directory or the user. \n
+             Checking the existence of a file or folder as well as reading system configuration files are considered safe operations. \n
+             Then give a ternary score 'yes', 'no' or 'approval' to indicate whether the given command is safe to run. \n
+
+         System context: \n{context}"""
+    answer_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            ("human",
+             "Generated command : \n {command} \n\n\n"),
+        ]
+    )
+
+    return CachedChain("security_judge", answer_prompt, structured_llm_judge, Security)
 
 
 def get_result_analyser():
@@ -218,4 +289,30 @@ def get_result_analyser():
         ]
     )
 
-    return answer_prompt | structured_llm_analyser
\ No newline at end of file
+    return CachedChain("result_analyser", answer_prompt, structured_llm_analyser, AnalyseCommandResult)
+
+def get_analysis_merger():
+    class MergedAnalysis(BaseModel):
+        """Merged analysis of consecutive parts of a command result"""
+
+        analysis: str = Field(
+            description="The merged command result analysis"
+        )
+
+    structured_llm_merger = llm().with_structured_output(MergedAnalysis)
+
+    system = """You are merging the analyses of consecutive parts of a command output into a single analysis. \n 
+         You have access to the command, its description and the task the command is trying to solve. \n
+         Keep all the information that is useful to solve the task, remove the repetitions between the parts. \n
+         Stay grounded to the partial analyses, don't add information that is not in them. \n
+         If a part reports an error, keep the error and its explanation. \n
+         Your merged analysis must be shorter than {max_chars} characters."""
+
+    merge_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            ("human", "Task: {task} \n\n\n Command : \n {command} \n\n description: \n {description} \n\n Partial analyses: \n {analyses}"),
+        ]
+    )
+
+    return CachedChain("analysis_merger", merge_prompt, structured_llm_merger, MergedAnalysis)
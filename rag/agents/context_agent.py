@@ -2,6 +2,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from rag.utils.llm import llm
+from rag.utils.llm_cache import CachedChain
 
 
 def get_document_evaluator():
@@ -25,7 +26,7 @@ def get_document_evaluator():
         ]
     )
 
-    return plan_completion_prompt | structured_llm_evaluator
+    return CachedChain("document_evaluator", plan_completion_prompt, structured_llm_evaluator, DocumentEvaluation)
 
 
 def get_summary_generator():
@@ -54,7 +55,34 @@ def get_summary_generator():
         ]
     )
 
-    return generator_prompt | structured_llm_summarizer
+    return CachedChain("summary_generator", generator_prompt, structured_llm_summarizer, Summary)
+
+
+def get_document_summarizer():
+    class Summary(BaseModel):
+        """Task independent summary of the document."""
+
+        summary: str = Field(
+            description="Compact summary of the document"
+        )
+
+    structured_llm_summarizer = llm().with_structured_output(Summary)
+
+    # Prompt
+    system = """You are an assistant summarising a document chunk that will be stored for later use. \n 
+        You don't know which task the summary will be used for, keep every fact that could be useful to work on this system. \n
+        Keep names, paths, versions, numbers and configuration values exactly as they appear in the document. \n
+        The summary should be compact, drop formatting, repetitions and boilerplate. \n
+        Stay grounded to the document, never add information that is not in it. \n"""
+    generator_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            ("human",
+             "Document: \n {document} \n\n\n"),
+        ]
+    )
+
+    return CachedChain("document_summarizer", generator_prompt, structured_llm_summarizer, Summary)
 
 
 def get_context_generator():
@@ -83,4 +111,4 @@ def get_context_generator():
         ]
     )
 
-    return planner_prompt | structured_llm_context_generator
+    return CachedChain("context_generator", planner_prompt, structured_llm_context_generator, Context)
@@ -1,7 +1,10 @@
+from typing import Literal
+
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
 from rag.utils.llm import llm
+from rag.utils.llm_cache import CachedChain
 
 
 def get_task_generator():
@@ -29,7 +32,7 @@ def get_task_generator():
         ]
     )
 
-    return generator_prompt | structured_llm_task_generator
+    return CachedChain("task_generator", generator_prompt, structured_llm_task_generator, Task)
 
 
 def get_system_context_query_generator():
@@ -56,7 +59,7 @@ def get_system_context_query_generator():
         ]
     )
 
-    return generator_prompt | structured_llm_task_generator
+    return CachedChain("system_context_query_generator", generator_prompt, structured_llm_task_generator, ContextQuery)
 
 def get_subtask_generator():
     class Task(BaseModel):
@@ -85,7 +88,7 @@ def get_subtask_generator():
         ]
     )
 
-    return generator_prompt | structured_llm_task_refiner
+    return CachedChain("subtask_generator", generator_prompt, structured_llm_task_refiner, Task)
 
 
 def get_plan_generator():
@@ -128,7 +131,7 @@ def get_plan_generator():
         ]
     )
 
-    return planner_prompt | structured_llm_plan_generator
+    return CachedChain("plan_generator", planner_prompt, structured_llm_plan_generator, Plan)
 
 
 def get_step_generator():
@@ -165,7 +168,7 @@ def get_step_generator():
         ]
     )
 
-    return step_prompt | structured_llm_step_generator
+    return CachedChain("step_generator", step_prompt, structured_llm_step_generator, Step)
 
 
 def get_step_evaluator():
@@ -195,7 +198,8 @@ def get_step_evaluator():
         ]
     )
 
-    return plan_completion_prompt | structured_llm_evaluator
+    return CachedChain("step_evaluator", plan_completion_prompt, structured_llm_evaluator, TaskEvaluation,
+                       accept=lambda output: output is not None and output.tool in ("action", "context", "generation"))
 
 def get_task_evaluator():
     class TaskEvaluation(BaseModel):
@@ -225,7 +229,7 @@ def get_task_evaluator():
         ]
     )
 
-    return plan_completion_prompt | structured_llm_evaluator
+    return CachedChain("task_evaluator", plan_completion_prompt, structured_llm_evaluator, TaskEvaluation)
 
 
 def get_task_grader():
@@ -248,7 +252,40 @@ def get_task_grader():
         ]
     )
 
-    return plan_completion_prompt | structured_llm_evaluator
+    return CachedChain("task_grader", plan_completion_prompt, structured_llm_evaluator, TaskGrade)
+
+
+def get_task_judge():
+    class TaskJudgement(BaseModel):
+        """Completion summary and score of the task."""
+
+        completion: str = Field(
+            description="The summary of what has been completed of the task"
+        )
+        score: Literal["yes", "no"] = Field(description="Task completion score 'yes' or 'no'")
+
+    structured_llm_judge = llm().with_structured_output(TaskJudgement)
+
+    # Prompt
+    system = """You are an evaluator assessing what has been completed in a task. \n 
+         Give a summary of what has been completed in the task. \n
+         Your summary should detail everything that has been done previously whether it has worked out or not. \n
+         You have the task you are evaluation, as well as the prior completion status and the progress that has been made. \n
+         You also have access to datas that have been fetched to help solve the task. \n 
+         Add comments in your summary to help direct the next step of the task. \n
+         If the task has not been addressed at all, answer "Nothing has been done yet". \n
+         Then give a binary score 'yes' or 'no' to indicate whether the task has been fully completed according to your summary. \n
+
+         Context : \n{context}"""
+    plan_completion_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            ("human",
+             "Task : {task} \n\n\n Prior completion status : \n {completion} \n\n\n Completion Progress : \n {progress} \n\n\n Useful data : {data}"),
+        ]
+    )
+
+    return CachedChain("task_judge", plan_completion_prompt, structured_llm_judge, TaskJudgement)
 
 
 def get_content_generator():
@@ -256,6 +293,8 @@ def get_content_generator():
         """Completion score to assess the task level of completion."""
 
         content: str = Field(description="The generated content")
+        path: str = Field(default="",
+                          description="The path of the file the content must be written to, empty if the task doesn't ask for a file")
 
     structured_llm_content = llm().with_structured_output(ContentGeneration)
 
@@ -263,17 +302,21 @@ def get_content_generator():
     system = """You are an assistant generating content. \n 
             Give generated content by following the task and using the context information. \n
             Make sure the length of your generation is not too long, and is not too short. \n
+            If the task asks to create or write a file, also give the path of the file, otherwise leave the path empty. \n
+            Only give the file content, never a command writing it. \n
 
             Context : \n{context}"""
     content_prompt = ChatPromptTemplate.from_messages(
         [
             ("system", system),
             ("human",
-             "Task : \n {task}"),
+             "Task : \n {task} \n\n Current execution path : {path}"),
         ]
     )
 
-    return content_prompt | structured_llm_content
+    # The path is optional, only the content is required
+    return CachedChain("content_generator", content_prompt, structured_llm_content, ContentGeneration,
+                       accept=lambda output: output is not None and bool(output.content))
 
 
 def get_data_generator():
@@ -307,7 +350,7 @@ def get_data_generator():
         ]
     )
 
-    return context_prompt | structured_llm_context
+    return CachedChain("data_generator", context_prompt, structured_llm_context, Data)
 
 def get_plan_evaluator():
     class PlanEvaluation(BaseModel):
@@ -341,7 +384,7 @@ def get_plan_evaluator():
         ]
     )
 
-    return plan_completion_prompt | structured_llm_evaluator
+    return CachedChain("plan_evaluator", plan_completion_prompt, structured_llm_evaluator, PlanEvaluation)
 
 
 def get_plan_grader():
@@ -363,7 +406,44 @@ def get_plan_grader():
         ]
     )
 
-    return plan_completion_prompt | structured_llm_evaluator
+    return CachedChain("plan_grader", plan_completion_prompt, structured_llm_evaluator, PlanGrade)
+
+
+def get_plan_judge():
+    class PlanJudgement(BaseModel):
+        """Completion summary and score of the plan."""
+
+        completion: str = Field(
+            description="The summary of what has been completed in the plan"
+        )
+        score: Literal["yes", "no"] = Field(description="Plan completion score 'yes' or 'no'")
+
+    structured_llm_judge = llm().with_structured_output(PlanJudgement)
+
+    # Prompt
+    system = """You are an evaluator assessing what as been completed in the plan. \n 
+         You have access to the plan, what has been completed in it as well as the current step of the plan we are addressing. \n
+         From the current step that was just addressed and its action result, generate a new summary of completion. \n
+         The generated plan completion summary should detail everything that has been done previously whether it has worked out or not. \n
+         But if the status of a step of the plan has changed, update it in your summary. \n
+         The summary must be an explanation of what has been done in the plan, with commentaries on it. \n
+         Combine the last summary of what has been completed with the new summary of completion. \n
+         If the task has not been addressed at all, answer "Nothing has been done yet".\n
+         if a step is not necessary anymore (because it's already covered by the previous action), specify it. \n
+         Then give a binary score 'yes' or 'no' to indicate whether the plan has been fully completed according to your summary. \n
+         
+         Plan data : \n{data}\n\n
+         Context : \n{context}"""
+
+    plan_completion_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            ("human",
+             "Plan : \n {plan} \n\n\n Plan Completion: \n {completion} \n\n\n Current Step: {step} \n\n\n Action result: \n {result}"),
+        ]
+    )
+
+    return CachedChain("plan_judge", plan_completion_prompt, structured_llm_judge, PlanJudgement)
 
 
 def get_answer_generator():
@@ -386,4 +466,4 @@ def get_answer_generator():
         ]
     )
 
-    return answer_prompt | structured_llm_answer
+    return CachedChain("answer_generator", answer_prompt, structured_llm_answer, Answer)
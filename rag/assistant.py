@@ -2,6 +2,8 @@ from rag.graphs.command_graph import CommandGraph
 from rag.graphs.context_graph import ContextGraph
 from rag.graphs.decision_graph import DecisionGraph
 from rag.utils.command_executor import CommandExecutor
+from rag.utils.config import get_config
+from rag.utils.llm_cache import get_llm_cache
 from rag.utils.vector_store import LocalVectorStore
 import getpass
 
@@ -10,7 +12,9 @@ class Assistant:
     def __init__(self):
         password = getpass.getpass("Enter your sudo password: ")
 
-        self._command_executor = CommandExecutor(password)
+        cfg = get_config()
+        self._command_executor = CommandExecutor(password, timeout=cfg.COMMAND_TIMEOUT,
+                                                 max_output_bytes=cfg.COMMAND_MAX_OUTPUT_BYTES)
 
         self._vector_store = LocalVectorStore()
         self._vector_store.load_index("FolderDocs")
@@ -42,4 +46,12 @@ class Assistant:
 
     def close(self):
         self._command_executor.close()
-        self._vector_store.close()
\ No newline at end of file
+        self._command_graph.close()
+        self._vector_store.close()
+
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            print("LLM cache hit rate:", llm_cache.hit_rate())
+            for agent, counters in llm_cache.stats().items():
+                print(f"     {agent}: {counters['hits']} hits, {counters['misses']} misses")
+            llm_cache.close()
\ No newline at end of file
@@ -1,11 +1,26 @@
+import codecs
 import sys
+import threading
 import time
-from typing import TypedDict, Tuple, List
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TypedDict, Tuple, List, Optional
 
 from langgraph.constants import START, END
 
 from rag.agents.command_agent import *
 from rag.graphs.graph_base import GraphBase
+from rag.utils.command_policy import CommandPolicy
+from rag.utils.concurrency import bounded_map
+from rag.utils.config import get_config
+from rag.utils.output_chunker import OutputChunker
+from rag.utils.output_parsers import find_parser, parse_output
+from rag.utils.output_reducer import reduce_output
+from rag.utils.shell import check_command
+from rag.utils.verdict_store import VerdictStore
+
+# Chunks of command output analysed before the analysis stops
+MAX_ANALYSED_CHUNKS = 21
+
 
 class CommandGraph(GraphBase):
     class InputState(TypedDict):
@@ -30,15 +45,42 @@ class CommandGraph(GraphBase):
         approved: int
 
         chunks: List[str]
+        analyses: Optional[List[str]]
+        parsed: Optional[str]
+        exit_code: int
+        timed_out: bool
+        truncated: bool
 
     def __init__(self, assistant):
+        self._parallel_gate = get_config().COMMAND_PARALLEL_GATE
+        self._fused_agents = get_config().FUSED_AGENTS
+        self._static_check = get_config().STATIC_COMMAND_CHECK
+        self._streaming_analysis = get_config().STREAMING_ANALYSIS
+        self._output_parsers = get_config().OUTPUT_PARSERS
+        self._output_reduction = get_config().OUTPUT_REDUCTION
+        self._output_reduction_max_chars = get_config().OUTPUT_REDUCTION_MAX_CHARS
+        self._analysis_concurrency = get_config().ANALYSIS_CONCURRENCY
+        self._map_reduce = get_config().ANALYSIS_MAP_REDUCE
+        # Merging fewer than two analyses at a time would never reduce them to one
+        self._reduce_fan_in = max(2, get_config().ANALYSIS_REDUCE_FAN_IN)
+        self._analysis_max_chars = get_config().ANALYSIS_MAX_CHARS
+        self._max_output_bytes = get_config().COMMAND_MAX_OUTPUT_BYTES
+        self._command_policy = CommandPolicy(get_config().SECURITY_RULES) if get_config().COMMAND_POLICY else None
+        self._verdict_store = VerdictStore(get_config().VERDICT_STORE_PATH, ttl=get_config().VERDICT_STORE_TTL) \
+            if get_config().VERDICT_STORE else None
         super().__init__(assistant, self.CommandGraphState, input_state=self.InputState, output_state=self.OutputState)
         self._command_executor = assistant.get_command_executor()
-        self._path = self._command_executor.run_command("pwd")
+        self._path = self._command_executor.cwd
 
     def get_path(self):
         return self._path
 
+    def close(self):
+        if self._verdict_store is not None:
+            for check, counters in self._verdict_store.stats().items():
+                print(f"Stored {check} verdicts: {counters['hits']} hits, {counters['misses']} misses")
+            self._verdict_store.close()
+
     def _load_agents(self) -> None:
         """
         Loads and initializes agent instances required for executing various tasks.
@@ -57,9 +99,12 @@ class CommandGraph(GraphBase):
             "correctness_grader": get_correctness_grader(),
             "security_evaluator": get_security_evaluator(),
             "security_grader": get_security_grader(),
+            "correctness_judge": get_correctness_judge(),
+            "security_judge": get_security_judge(),
 
             "executor": self._assistant.get_command_executor(),
             "result_analyser": get_result_analyser(),
+            "analysis_merger": get_analysis_merger(),
         }
 
     def _load_nodes(self, builder) -> None:
@@ -76,8 +121,11 @@ class CommandGraph(GraphBase):
         builder.add_node("description_generator", self.description_generator)
         builder.add_node("command_generator", self.command_generator)
 
-        builder.add_node("correctness_evaluator", self.correctness_evaluator)
-        builder.add_node("security_evaluator", self.security_evaluator)
+        if self._parallel_gate:
+            builder.add_node("pre_execution_evaluator", self.pre_execution_evaluator)
+        else:
+            builder.add_node("correctness_evaluator", self.correctness_evaluator)
+            builder.add_node("security_evaluator", self.security_evaluator)
         builder.add_node("abort", self.abort)
 
         builder.add_node("approval", self.approval)
@@ -99,24 +147,37 @@ class CommandGraph(GraphBase):
         """
         builder.add_edge(START, "description_generator")
         builder.add_edge("description_generator", "command_generator")
-        builder.add_edge("command_generator", "correctness_evaluator")
-
-        builder.add_conditional_edges(
-            "correctness_evaluator",
-            self.correctness_evaluation,
-            {
-                "incorrect": "command_generator",
-                "correct": "security_evaluator",
-            })
+        if self._parallel_gate:
+            builder.add_edge("command_generator", "pre_execution_evaluator")
+
+            builder.add_conditional_edges(
+                "pre_execution_evaluator",
+                self.pre_execution_evaluation,
+                {
+                    "incorrect": "command_generator",
+                    "abort": "abort",
+                    "approve": "approval",
+                    "execute": "executor",
+                })
+        else:
+            builder.add_edge("command_generator", "correctness_evaluator")
+
+            builder.add_conditional_edges(
+                "correctness_evaluator",
+                self.correctness_evaluation,
+                {
+                    "incorrect": "command_generator",
+                    "correct": "security_evaluator",
+                })
 
-        builder.add_conditional_edges(
-            "security_evaluator",
-            self.security_evaluation,
-            {
-                "abort": "abort",
-                "approve": "approval",
-                "execute": "executor",
-            })
+            builder.add_conditional_edges(
+                "security_evaluator",
+                self.security_evaluation,
+                {
+                    "abort": "abort",
+                    "approve": "approval",
+                    "execute": "executor",
+                })
 
         builder.add_conditional_edges(
             "approval",
@@ -227,25 +288,13 @@ g
         command = state["command"]
 
         start_time = time.time()
-        evaluator = None
-        while not evaluator or not evaluator.comment:
-            if evaluator:
-                print("Failed generation. Retrying...")
-            evaluator = self._agents["correctness_evaluator"].invoke(
-                {"context": context, "task": task, "command": command})
-        print("     ---GRADING THE CORRECTNESS---")
-        grader = None
-        while not grader or not grader.score:
-            if grader:
-                print("Failed generation. Retrying...")
-            grader = self._agents["correctness_grader"].invoke(
-                {"context": context, "command": command, "correctness": evaluator.comment})
+        correctness = self._check_correctness(context, task, command)
         total_time = time.time() - start_time
 
         print("     Total time:", total_time)
-        print("     Correctness:", grader.score)
+        print("     Correctness:", correctness[1])
 
-        return {"correctness": (evaluator.comment, grader.score)}
+        return {"correctness": correctness}
 
     def security_evaluator(self, state: CommandGraphState):
         """
@@ -268,12 +317,153 @@ g
         command = state["command"]
 
         start_time = time.time()
+        security = self._check_security(context, command)
+        total_time = time.time() - start_time
+
+        print("     Total time:", total_time)
+        print("     Security:", security[1])
+
+        return {"security": security}
+
+    def pre_execution_evaluator(self, state: CommandGraphState):
+        """
+        Evaluates the correctness and the security of the command in parallel.
+
+        Both checks only depend on the command, so they run as two concurrent
+        branches. As soon as one of them rejects the command, the other branch is
+        cancelled: it skips its remaining LLM calls and the node returns without
+        waiting for the call in flight, whose result is discarded.
+
+        Args:
+            state (CommandGraphState): The state containing the task, the context
+                and the command to evaluate.
+
+        Returns:
+            dict: The correctness and security verdicts as (comment, score), a
+                cancelled branch having the score "skipped".
+        """
+        print("     ---EVALUATING THE CORRECTNESS AND THE SECURITY---")
+        task = state["task"]
+        context = state["context"]
+        command = state["command"]
+
+        start_time = time.time()
+        cancelled = threading.Event()
+        verdicts = {"correctness": ("Not evaluated, the command was rejected.", "skipped"),
+                    "security": ("Not evaluated, the command was rejected.", "skipped")}
+
+        pool = ThreadPoolExecutor(max_workers=2)
+        pending = {
+            pool.submit(self._check_correctness, context, task, command, cancelled): "correctness",
+            pool.submit(self._check_security, context, command, cancelled): "security",
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                check = pending.pop(future)
+                verdict = future.result()
+                if verdict is None:
+                    continue
+                verdicts[check] = verdict
+                if verdict[1] == "no":
+                    print(f"     The command was rejected by the {check} check, cancelling the other check.")
+                    cancelled.set()
+                    pending = {}
+        pool.shutdown(wait=False, cancel_futures=True)
+        total_time = time.time() - start_time
+
+        print("     Total time:", total_time)
+        print("     Correctness:", verdicts["correctness"][1])
+        print("     Security:", verdicts["security"][1])
+
+        return verdicts
+
+    def _check_correctness(self, context, task, command, cancelled=None):
+        # Syntax errors and missing programs are caught locally, the LLM only judges the semantic fit.
+        # The programs are looked up in the session, which knows the functions and PATH of the earlier steps
+        if self._static_check:
+            error = check_command(command, self._command_executor)
+            if error:
+                print("     Static check failed:", error)
+                return error, "no"
+
+        if self._verdict_store is not None:
+            verdict = self._verdict_store.get("correctness", command, self._path, task)
+            if verdict is not None:
+                print("     Stored correctness verdict:", verdict[1])
+                return verdict
+        verdict = self._grade_correctness(context, task, command, cancelled)
+        if verdict is not None and self._verdict_store is not None:
+            self._verdict_store.set("correctness", command, self._path, verdict, task)
+        return verdict
+
+    def _grade_correctness(self, context, task, command, cancelled=None):
+        if self._fused_agents.correctness:
+            judge = None
+            while not judge or not judge.comment or not judge.score:
+                if judge:
+                    print("Failed generation. Retrying...")
+                judge = self._agents["correctness_judge"].invoke(
+                    {"context": context, "task": task, "command": command})
+            return judge.comment, judge.score
+
+        evaluator = None
+        while not evaluator or not evaluator.comment:
+            if evaluator:
+                print("Failed generation. Retrying...")
+            evaluator = self._agents["correctness_evaluator"].invoke(
+                {"context": context, "task": task, "command": command})
+        if cancelled is not None and cancelled.is_set():
+            return None
+        print("     ---GRADING THE CORRECTNESS---")
+        grader = None
+        while not grader or not grader.score:
+            if grader:
+                print("Failed generation. Retrying...")
+            grader = self._agents["correctness_grader"].invoke(
+                {"context": context, "command": command, "correctness": evaluator.comment})
+
+        return evaluator.comment, grader.score
+
+    def _check_security(self, context, command, cancelled=None):
+        if self._command_policy is not None:
+            verdict = self._command_policy.classify(command, self._path)
+            stats = self._command_policy.stats()
+            print(f"     Security rules decided {stats['local']} of {stats['local'] + stats['deferred']} "
+                  f"commands locally ({stats['local_fraction']:.0%}).")
+            if verdict is not None:
+                reason, score = verdict[1], verdict[0]
+                print("     Security rules verdict:", score, "-", reason)
+                return reason, score
+
+        if self._verdict_store is not None:
+            verdict = self._verdict_store.get("security", command, self._path)
+            if verdict is not None:
+                print("     Stored security verdict:", verdict[1])
+                return verdict
+        verdict = self._grade_security(context, command, cancelled)
+        if verdict is not None and self._verdict_store is not None:
+            self._verdict_store.set("security", command, self._path, verdict)
+        return verdict
+
+    def _grade_security(self, context, command, cancelled=None):
+        if self._fused_agents.security:
+            judge = None
+            while not judge or not judge.security or not judge.score:
+                if judge:
+                    print("Failed generation. Retrying...")
+                judge = self._agents["security_judge"].invoke(
+                    {"context": context, "command": command})
+            return judge.security, judge.score
+
         evaluator = None
         while not evaluator or not evaluator.security:
             if evaluator:
                 print("Failed generation. Retrying...")
             evaluator = self._agents["security_evaluator"].invoke(
                 {"context": context, "command": command})
+        if cancelled is not None and cancelled.is_set():
+            return None
         print("     ---GRADING THE SECURITY---")
         grader = None
         while not grader or not grader.score:
@@ -281,12 +471,8 @@ g
                 print("Failed generation. Retrying...")
             grader = self._agents["security_grader"].invoke(
                 {"context": context, "command": command, "security": evaluator.security})
-        total_time = time.time() - start_time
 
-        print("     Total time:", total_time)
-        print("     Security:", grader.score)
-
-        return {"security": (evaluator.security, grader.score)}
+        return evaluator.security, grader.score
 
     @staticmethod
     def abort(state: CommandGraphState):
@@ -345,21 +531,192 @@ g
                 maps to the command to be run.
 
         Returns:
-            dict: A dictionary containing the result of the execution, under the key
-                "result".
+            dict: The exit code of the command and its output split in chunks, stdout
+                followed by stderr when it succeeded, stderr first when it failed.
         """
         print("     ---EXECUTING THE COMMAND---")
         command = state["command"]
 
         start_time = time.time()
-        result = self._agents["executor"].run_command(command)
-        chunks = self.chunk_output(result)
-
-        self._path = self._agents["executor"].run_command("pwd")
+        parser = find_parser(command) if self._output_parsers else None
+        if self._streaming_analysis and parser is None:
+            result, analyses = self._run_and_analyse(state)
+        else:
+            result, analyses = self._agents["executor"].run(command), None
+        print(f"     Exit code {result.exit_code}, {result.stdout_bytes} bytes on stdout, "
+              f"{result.stderr_bytes} bytes on stderr in {result.duration:.2f}s")
+        if result.truncated:
+            print(f"     Output truncated, {result.dropped_bytes} bytes dropped.")
+        output = result.output
+        if not result.ok:
+            # The error comes first, followed by what the command printed before failing
+            output = "\n".join(part.rstrip("\n") for part in (result.stderr, result.stdout) if part)
+        if self._output_reduction and analyses is None:
+            reduction = reduce_output(output, f"{state['task']} {state['description']} {command}",
+                                      self._output_reduction_max_chars)
+            if reduction.output_bytes != reduction.input_bytes:
+                print(f"     Output reduced from {reduction.input_bytes} to {reduction.output_bytes} bytes "
+                      f"({reduction.duplicates} repeated, {reduction.collapsed} similar and {reduction.omitted} "
+                      f"irrelevant lines dropped).")
+            output = reduction.text
+        chunks = self.chunk_output(output)
+
+        parsed = None
+        if parser is not None and result.ok and not result.truncated:
+            # Rows longer than an analysis are left to the analyser and the output reduction
+            parsed = parse_output(command, result.stdout, self._analysis_max_chars)
+
+        # The shell reports its working directory with the end of the command
+        self._path = result.cwd or self._path
         total_time = time.time() - start_time
         print("     Total time:", total_time)
 
-        return {"chunks": chunks}
+        return {"chunks": chunks, "exit_code": result.exit_code, "analyses": analyses, "parsed": parsed,
+                "timed_out": result.timed_out, "truncated": result.truncated}
+
+    def _run_and_analyse(self, state):
+        """
+        Runs the command and analyses its stdout while it is produced: each chunk is
+        submitted to the analyser as soon as it is complete, on a bounded pool of
+        workers, stderr being analysed once the command ended. The analyses are only
+        kept when the command succeeds, a failed command being analysed from its
+        error output first. With the output reduction,
+        an output growing over OUTPUT_REDUCTION_MAX_CHARS stops the streamed
+        analysis, the whole output is reduced and analysed once the command ended.
+        Without it, only the first COMMAND_MAX_OUTPUT_BYTES bytes are analysed.
+        """
+        chunker = OutputChunker()
+        decoder = codecs.getincrementaldecoder("utf8")(errors="replace")
+        pool = ThreadPoolExecutor(max_workers=self._analysis_concurrency)
+        futures = []
+        produced = 0
+        received = 0
+        received_bytes = 0
+        over_budget = False
+
+        def submit(chunks):
+            nonlocal produced
+            for chunk in chunks:
+                produced += 1
+                if self._map_reduce or len(futures) < MAX_ANALYSED_CHUNKS:
+                    futures.append(pool.submit(self._analyse_chunk, state, chunk, "", len(futures), None))
+
+        def on_output(name, data):
+            nonlocal received, received_bytes, over_budget
+            if name != "stdout" or over_budget:
+                return
+            # The executor forwards every chunk, even those it drops from the result
+            if self._max_output_bytes and received_bytes + len(data) > self._max_output_bytes:
+                data = data[:self._max_output_bytes - received_bytes]
+            received_bytes += len(data)
+            if not data:
+                return
+            text = decoder.decode(data)
+            received += len(text)
+            if self._output_reduction and received > self._output_reduction_max_chars:
+                print("     The output is over the reduction budget, stopping the streamed analysis.")
+                over_budget = True
+                for future in futures:
+                    future.cancel()
+                return
+            submit(chunker.feed(text))
+
+        result = self._agents["executor"].run(state["command"], on_output=on_output)
+        if self._output_reduction and received + len(result.stderr) > self._output_reduction_max_chars:
+            over_budget = True
+        if not result.ok or over_budget:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+            return result, None
+
+        submit(chunker.feed(decoder.decode(b"", final=True)) + chunker.flush())
+        # Many tools (java -version, git clone, docker compose) report on stderr when they succeed
+        if result.stderr:
+            submit(self.chunk_output(result.stderr))
+        analyses = [future.result() for future in futures]
+        pool.shutdown()
+        if produced > len(futures):
+            analyses.append(self._analysis_stopped(len(futures), produced))
+        if received_bytes < result.stdout_bytes:
+            analyses.append(f"Only the first {received_bytes} bytes of the output were analysed, "
+                            f"the last {result.stdout_bytes - received_bytes} bytes were not.")
+        return result, analyses
+
+    def _analyse_chunk(self, state, chunk, status, index, total):
+        print(f"     Analyzing chunk {index + 1}/{total or '?'}...")
+        start_time = time.time()
+        analyser = None
+        while not analyser or not analyser.analysis:
+            if analyser:
+                print("Failed generation. Retrying...")
+            analyser = self._agents["result_analyser"].invoke({
+                "task": state["task"],
+                "context": state["context"],
+                "command": state["command"],
+                "description": state["description"],
+                "result": status + chunk
+            })
+        total_time = time.time() - start_time
+        print(f"     Chunk {index + 1} analyzed in {total_time:.2f}s")
+        return analyser.analysis
+
+    def _reduce_analyses(self, state, analyses):
+        """
+        Merges the chunk analyses in a tree: each level merges groups of
+        ANALYSIS_REDUCE_FAN_IN consecutive analyses in parallel, until a single
+        analysis remains. The number of levels grows with the logarithm of the
+        number of chunks.
+        """
+        level = 0
+        while len(analyses) > 1:
+            level += 1
+            groups = [analyses[start:start + self._reduce_fan_in]
+                      for start in range(0, len(analyses), self._reduce_fan_in)]
+            print(f"     Merging {len(analyses)} analyses into {len(groups)} (level {level})...")
+            analyses = bounded_map(lambda group: self._merge_analyses(state, group), groups,
+                                   self._analysis_concurrency)
+        return analyses[0] if analyses else ""
+
+    def _merge_analyses(self, state, analyses):
+        """
+        Merges consecutive analyses into one of at most ANALYSIS_MAX_CHARS characters.
+        The model does not always follow the length instruction: a merge over the
+        budget is condensed once more, and cut if it is still too long.
+        """
+        if len(analyses) == 1:
+            return analyses[0]
+        analysis = self._invoke_merger(state, analyses)
+        if len(analysis) > self._analysis_max_chars:
+            print(f"     Merged analysis of {len(analysis)} characters over the budget, condensing it...")
+            condensed = self._invoke_merger(state, [analysis])
+            analysis = min(analysis, condensed, key=len)
+        if len(analysis) > self._analysis_max_chars:
+            marker = "\n[... analysis truncated]"
+            analysis = analysis[:max(0, self._analysis_max_chars - len(marker))] + marker
+        return analysis
+
+    def _invoke_merger(self, state, analyses):
+        merger = None
+        while not merger or not merger.analysis:
+            if merger:
+                print("Failed generation. Retrying...")
+            merger = self._agents["analysis_merger"].invoke({
+                "task": state["task"],
+                "command": state["command"],
+                "description": state["description"],
+                "analyses": "\n\n".join(f"Part {i + 1}:\n{analysis}" for i, analysis in enumerate(analyses)),
+                "max_chars": self._analysis_max_chars,
+            })
+        return merger.analysis
+
+    @staticmethod
+    def _analysis_stopped(analysed, total):
+        print(f"     Logs are too long for complete analysis.")
+        print(f"     Stopping logs analysis at {MAX_ANALYSED_CHUNKS} chunks.")
+        return ("The analysis stopped. \n "
+                "The data is too long for complete analysis.\n"
+                "Analysed {}% of the result.\n".format(analysed / total * 100))
 
     def result_analyser(self, state: CommandGraphState):
         """
@@ -367,7 +724,9 @@ g
 
         This method uses the `result_analyser` agent to process the provided state information
         and computes the completion level of the task. It measures and displays the total
-        execution time for the analysis.
+        execution time for the analysis. A command that succeeded without output needs no
+        analysis, the output of the commands with a local parser is returned as JSON rows,
+        and a failed command is analysed from its error output first.
 
         Args:
             state (CommandGraphState): A dictionary-like state object containing the execution
@@ -378,44 +737,50 @@ g
                 `result_analyser` agent.
         """
         print("     ---ANALYSING THE RESULT---")
-        context = state["context"]
-        task = state["task"]
         command = state["command"]
         description = state["description"]
         chunks = state["chunks"]
-
-        analysis_parts = []
+        exit_code = state["exit_code"]
+
+        status = ""
+        if state["timed_out"]:
+            status += "The command timed out and was interrupted.\n"
+        elif exit_code != 0:
+            status += f"The command failed with exit code {exit_code}.\n"
+        if state["truncated"]:
+            status += "Only the beginning and the end of the output were kept.\n"
+
+        if state.get("parsed") is not None:
+            print("     The output was parsed locally, skipping the analysis.")
+            return {"action": command, "description": description, "result": state["parsed"]}
+
+        if not status and not chunks:
+            print("     The command succeeded without output, skipping the analysis.")
+            return {"action": command, "description": description,
+                    "result": "The command succeeded (exit code 0) without output."}
+        # A failure without output is analysed from its status alone
+        chunks = chunks or [""]
 
         analysis_start_time = time.time()
 
-        for i, chunk in enumerate(chunks):
-            if i > 20:
-                print(f"     Logs are too long for complete analysis.")
-                print(f"     Stopping logs analysis at 20 chunks.")
-
-                analysis_parts.append("The analysis stopped. \n "
-                                      "The data is too long for complete analysis.\n"
-                                      "Analysed {}% of the result.\n".format((i + 1) / len(chunks) * 100))
-                break
-            print(f"     Analyzing chunk {i + 1}/{len(chunks)}...")
-            start_time = time.time()
-            analyser = None
-            while not analyser or not analyser.analysis:
-                if analyser:
-                    print("Failed generation. Retrying...")
-                analyser = self._agents["result_analyser"].invoke({
-                    "task": task,
-                    "context": context,
-                    "command": command,
-                    "description": description,
-                    "result": chunk
-                })
-            total_time = time.time() - start_time
-            print(f"     Chunk {i + 1} analyzed in {total_time:.2f}s")
-            analysis_parts.append(analyser.analysis)
+        analyses = state.get("analyses")
+        if analyses is not None:
+            print(f"     {len(analyses)} chunks were analysed during the execution.")
+            analysis_parts = ([status] if status else []) + analyses
+        elif self._map_reduce:
+            analysis_parts = bounded_map(lambda item: self._analyse_chunk(state, item[1], status, item[0], len(chunks)),
+                                         enumerate(chunks), self._analysis_concurrency)
+        else:
+            analysis_parts = [self._analyse_chunk(state, chunk, status, i, len(chunks))
+                              for i, chunk in enumerate(chunks[:MAX_ANALYSED_CHUNKS])]
+            if len(chunks) > MAX_ANALYSED_CHUNKS:
+                analysis_parts.append(self._analysis_stopped(MAX_ANALYSED_CHUNKS, len(chunks)))
 
         # Merge or summarize the full analysis
-        full_analysis = "\n\n".join(analysis_parts)
+        if self._map_reduce:
+            full_analysis = self._reduce_analyses(state, analysis_parts)
+        else:
+            full_analysis = "\n\n".join(analysis_parts)
         print("     Total time:", time.time() - analysis_start_time)
         return {"action": command, "description": description, "result": full_analysis}
 
@@ -468,6 +833,29 @@ g
             return "approve"
         return "execute"
 
+    @staticmethod
+    def pre_execution_evaluation(state: CommandGraphState):
+        """
+        Joins the parallel correctness and security checks.
+
+        Args:
+            state (CommandGraphState): The state containing both verdicts.
+
+        Returns:
+            str: "incorrect" to regenerate the command, otherwise the security
+                route: "abort", "approve" or "execute".
+        """
+        (_, correctness) = state["correctness"]
+        (_, security) = state["security"]
+
+        if correctness == "no":
+            return "incorrect"
+        if security == "no":
+            return "abort"
+        if security == "approval":
+            return "approve"
+        return "execute"
+
     @staticmethod
     def approval_evaluation(state: CommandGraphState):
         approval = state["approved"]
@@ -479,20 +867,5 @@ g
     @staticmethod
     def chunk_output(output: str, max_chars: int = 3000) -> list[str]:
         """Splits the output string into chunks of max_chars."""
-        lines = output.splitlines()
-        chunks = []
-        current_chunk = []
-        current_len = 0
-
-        for line in lines:
-            if current_len + len(line) + 1 > max_chars:
-                chunks.append("\n".join(current_chunk))
-                current_chunk = []
-                current_len = 0
-            current_chunk.append(line)
-            current_len += len(line) + 1  # +1 for newline
-
-        if current_chunk:
-            chunks.append("\n".join(current_chunk))
-
-        return chunks
+        chunker = OutputChunker(max_chars)
+        return chunker.feed(output) + chunker.flush()
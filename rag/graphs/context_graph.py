@@ -1,10 +1,15 @@
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import TypedDict, List, Tuple
 
 from langgraph.constants import START, END
 
 from rag.agents.context_agent import *
 from rag.graphs.graph_base import GraphBase
+from rag.utils.concurrency import bounded_map
+from rag.utils.config import get_config
 
 
 class ContextGraph(GraphBase):
@@ -22,6 +27,14 @@ class ContextGraph(GraphBase):
         summaries: List[str]
 
     def __init__(self, assistant):
+        self._concurrency = get_config().CONTEXT_CONCURRENCY
+        self._pipeline = get_config().CONTEXT_PIPELINE
+        self._stored_summaries = get_config().CONTEXT_STORED_SUMMARIES
+        self._stored_summary_max_chars = get_config().STORED_SUMMARY_MAX_CHARS
+        self._accept_score = get_config().RELEVANCE_ACCEPT_SCORE
+        self._reject_score = get_config().RELEVANCE_REJECT_SCORE
+        self._grading_stats = Counter()
+        self._stats_lock = threading.Lock()
         super().__init__(assistant, self.ContextGraphState, input_state=self.InputState, output_state=self.OutputState)
 
     def _load_agents(self) -> None:
@@ -44,15 +57,22 @@ class ContextGraph(GraphBase):
 
     def _load_nodes(self, builder) -> None:
         builder.add_node("document_retriever", self.document_retriever)
-        builder.add_node("document_evaluator", self.document_evaluator)
-        builder.add_node("summary_generator", self.summary_generator)
+        if self._pipeline:
+            builder.add_node("document_processor", self.document_processor)
+        else:
+            builder.add_node("document_evaluator", self.document_evaluator)
+            builder.add_node("summary_generator", self.summary_generator)
         builder.add_node("context_generator", self.context_generator)
 
     def _load_edges(self, builder) -> None:
         builder.add_edge(START, "document_retriever")
-        builder.add_edge("document_retriever", "document_evaluator")
-        builder.add_edge("document_evaluator", "summary_generator")
-        builder.add_edge("summary_generator", "context_generator")
+        if self._pipeline:
+            builder.add_edge("document_retriever", "document_processor")
+            builder.add_edge("document_processor", "context_generator")
+        else:
+            builder.add_edge("document_retriever", "document_evaluator")
+            builder.add_edge("document_evaluator", "summary_generator")
+            builder.add_edge("summary_generator", "context_generator")
         builder.add_edge("context_generator", END)
 
     def document_retriever(self, state: ContextGraphState):
@@ -72,17 +92,10 @@ class ContextGraph(GraphBase):
         task = state["task"]
         documents = state["documents"]
 
-        relevant_documents = []
-
         start_time = time.time()
-        for document in documents:
-            evaluation = None
-            while not evaluation or not evaluation.relevance:
-                if evaluation:
-                    print("Failed generation. Retrying...")
-                evaluation = self._agents["document_evaluator"].invoke({"context": context, "task": task, "document": document})
-            if evaluation.relevance == 'yes':
-                relevant_documents.append(document)
+        relevances = bounded_map(lambda document: self._evaluate_document(context, task, document),
+                                 documents, self._concurrency)
+        relevant_documents = [document for document, relevance in zip(documents, relevances) if relevance == 'yes']
         total_time = time.time() - start_time
 
         print("     Total time:", total_time)
@@ -94,20 +107,111 @@ class ContextGraph(GraphBase):
         documents = state["documents"]
 
         start_time = time.time()
-        summaries = []
-        for document in documents:
-            generation = None
-            while not generation or not generation.summary:
-                if generation:
-                    print("Failed generation. Retrying...")
-                generation = self._agents["summary_generator"].invoke(
-                    {"task": task, "document": document})
-            summaries.append(generation.summary)
+        summaries = bounded_map(lambda document: self._summarize_document(task, document),
+                                documents, self._concurrency)
         total_time = time.time() - start_time
 
         print("     Total time:", total_time)
         return {"summaries": summaries}
 
+    def document_processor(self, state: ContextGraphState):
+        """
+        Grades and summarizes the retrieved documents as a per-document pipeline.
+
+        Every document is graded in the shared worker pool, and a document graded
+        'yes' is submitted for summarization as soon as its grade is known, while
+        the remaining documents are still being graded. There is no barrier
+        between the two stages, so one slow grading only delays its own summary.
+
+        Args:
+            state (ContextGraphState): The state containing the context, the task
+                and the retrieved documents.
+
+        Returns:
+            dict: The summaries of the relevant documents, in retrieval order.
+        """
+        print("     ---EVALUATING AND SUMMARIZING DOCUMENTS---")
+        context = state["context"]
+        task = state["task"]
+        documents = state["documents"]
+
+        start_time = time.time()
+        summaries = {}
+        with ThreadPoolExecutor(max_workers=max(1, self._concurrency)) as pool:
+            pending = {pool.submit(self._evaluate_document, context, task, document): ("evaluation", index, document)
+                       for index, document in enumerate(documents)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    (stage, index, document) = pending.pop(future)
+                    if stage == "evaluation":
+                        if future.result() == 'yes':
+                            pending[pool.submit(self._summarize_document, task, document)] = ("summary", index, document)
+                    else:
+                        summaries[index] = future.result()
+                        print(f"     Document {index + 1}/{len(documents)} summarized after {time.time() - start_time:.2f}s")
+        total_time = time.time() - start_time
+
+        print("     Total time:", total_time)
+        return {"summaries": [summaries[index] for index in sorted(summaries)]}
+
+    def get_grading_stats(self):
+        return dict(self._grading_stats)
+
+    @staticmethod
+    def prefilter(score, accept_score, reject_score):
+        """
+        Decides the relevance of a document from its retrieval score alone.
+
+        Args:
+            score: The similarity score of the document, None if unknown.
+            accept_score: Documents scoring at least this are relevant, None disables auto-accept.
+            reject_score: Documents scoring below this are irrelevant, None disables auto-reject.
+
+        Returns:
+            str: 'yes' or 'no' when the score is conclusive, None when the LLM grader is needed.
+        """
+        if score is None:
+            return None
+        if accept_score is not None and score >= accept_score:
+            return 'yes'
+        if reject_score is not None and score < reject_score:
+            return 'no'
+        return None
+
+    def _evaluate_document(self, context, task, document):
+        relevance = self.prefilter(document.metadata.get("score"), self._accept_score, self._reject_score)
+        with self._stats_lock:
+            self._grading_stats["graded" if relevance is None else "accepted" if relevance == 'yes' else "rejected"] += 1
+        if relevance is not None:
+            return relevance
+
+        # The grader sees the text alone, the score in the metadata depends on the query and would defeat the cache
+        evaluation = None
+        while not evaluation or not evaluation.relevance:
+            if evaluation:
+                print("Failed generation. Retrying...")
+            evaluation = self._agents["document_evaluator"].invoke(
+                {"context": context, "task": task, "document": document.page_content})
+        return evaluation.relevance
+
+    def _summarize_document(self, task, document):
+        # Summaries computed at ingest time are used as is, the LLM only condenses
+        # them for the task when they exceed the budget.
+        stored_summary = document.metadata.get("summary") if self._stored_summaries else None
+        if stored_summary and len(stored_summary) <= self._stored_summary_max_chars:
+            return stored_summary
+        # Only the text reaches the prompts and the cache keys, the metadata holds the query dependent score
+        text = stored_summary or document.page_content
+
+        generation = None
+        while not generation or not generation.summary:
+            if generation:
+                print("Failed generation. Retrying...")
+            generation = self._agents["summary_generator"].invoke(
+                {"task": task, "document": text})
+        return generation.summary
+
     def context_generator(self, state: ContextGraphState):
         print("     ---GENERATING CONTEXT---")
         context = state["context"]
@@ -5,6 +5,8 @@ from langgraph.constants import START, END
 
 from rag.agents.decision_agent import *
 from rag.graphs.graph_base import GraphBase
+from rag.utils.command_policy import CommandPolicy
+from rag.utils.config import get_config
 
 
 class DecisionGraph(GraphBase):
@@ -28,6 +30,9 @@ class DecisionGraph(GraphBase):
         context: str
 
     def __init__(self, assistant):
+        self._fused_agents = get_config().FUSED_AGENTS
+        self._file_write_fast_path = get_config().FILE_WRITE_FAST_PATH
+        self._file_policy = CommandPolicy(get_config().SECURITY_RULES)
         super().__init__(assistant, self.DecisionGraphState, input_state=self.InputState, output_state=self.OutputState)
 
     def _load_agents(self) -> None:
@@ -46,6 +51,7 @@ class DecisionGraph(GraphBase):
             "system_context_query_generator": get_system_context_query_generator(),
             "task_evaluator": get_task_evaluator(),
             "task_grader": get_task_grader(),
+            "task_judge": get_task_judge(),
             "subtask_generator": get_subtask_generator(),
             "plan_generator": get_plan_generator(),
             "step_generator": get_step_generator(),
@@ -56,6 +62,7 @@ class DecisionGraph(GraphBase):
             "data_generator": get_data_generator(),
             "plan_evaluator": get_plan_evaluator(),
             "plan_grader": get_plan_grader(),
+            "plan_judge": get_plan_judge(),
             "answer_generator": get_answer_generator(),
         }
 
@@ -110,7 +117,8 @@ class DecisionGraph(GraphBase):
             {
                 "action": "action_executor",
                 "context": "context_getter",
-                "generation": "action_executor",
+                # Generated content is written by the executor directly instead of through a generated command
+                "generation": "content_generator" if self._file_write_fast_path else "action_executor",
             },
         )
 
@@ -202,25 +210,36 @@ class DecisionGraph(GraphBase):
         (_, subtask_completion) = state.get("subtask", ("", "Nothing has been done yet."))
 
         start_time = time.time()
-        evaluator = None
-        while not evaluator or not evaluator.completion:
-            if evaluator:
-                print("Failed generation. Retrying...")
-            evaluator = self._agents["task_evaluator"].invoke(
-                {"context": context, "task": task, "completion": task_completion,
-                 "progress": subtask_completion, "data": data})
-        print("---GRADING TASK---")
-        grader = None
-        while not grader or not grader.score:
-            if grader:
-                print("Failed generation. Retrying...")
-            grader = self._agents["task_grader"].invoke(
-                {"context": context, "task": task, "completion": evaluator.completion})
+        if self._fused_agents.task:
+            judge = None
+            while not judge or not judge.completion or not judge.score:
+                if judge:
+                    print("Failed generation. Retrying...")
+                judge = self._agents["task_judge"].invoke(
+                    {"context": context, "task": task, "completion": task_completion,
+                     "progress": subtask_completion, "data": data})
+            (completion, score) = (judge.completion, judge.score)
+        else:
+            evaluator = None
+            while not evaluator or not evaluator.completion:
+                if evaluator:
+                    print("Failed generation. Retrying...")
+                evaluator = self._agents["task_evaluator"].invoke(
+                    {"context": context, "task": task, "completion": task_completion,
+                     "progress": subtask_completion, "data": data})
+            print("---GRADING TASK---")
+            grader = None
+            while not grader or not grader.score:
+                if grader:
+                    print("Failed generation. Retrying...")
+                grader = self._agents["task_grader"].invoke(
+                    {"context": context, "task": task, "completion": evaluator.completion})
+            (completion, score) = (evaluator.completion, grader.score)
         total_time = time.time() - start_time
 
         print("Total time:", total_time)
 
-        return {"task": (task, evaluator.completion, grader.score)}
+        return {"task": (task, completion, score)}
 
     def subtask_generator(self, state: DecisionGraphState):
         print("---GENERATING SUBTASK---")
@@ -327,13 +346,44 @@ class DecisionGraph(GraphBase):
             if generation:
                 print("Failed generation. Retrying...")
             generation = self._agents["content_generator"].invoke(
-                {"context": context, "task": step})
+                {"context": context, "task": step, "path": self._assistant.get_path()})
+        result = generation.content
+        if generation.path:
+            result += "\n\n" + self.write_content(generation.path, generation.content)
         total_time = time.time() - start_time
 
         print("Total time:", total_time)
 
-        return {"action": ("content_generator", step, generation.content)}
+        return {"action": ("content_generator", step, result)}
 
+    def write_content(self, path: str, content: str) -> str:
+        """
+        Writes generated content to a file with the executor, after checking the path
+        against the security rules. Returns the outcome of the write.
+        """
+        # The executor writes exactly the path the policy checked
+        path = self._file_policy.resolve(path, self._assistant.get_path())
+        verdict, reason = self._file_policy.classify_path(path)
+        print(f"Write {path}: {verdict} ({reason})")
+        if verdict == "no":
+            return f"The file {path} was not written: {reason}"
+        if verdict == "approval":
+            print("--- USER APPROVAL NEEDED ---")
+            print(f"File: {path}")
+            print(f"Content: {content}")
+            while True:
+                decision = input("Approve writing? (yes/no): ").strip().lower()
+                if decision in {"yes", "y"}:
+                    break
+                elif decision in {"no", "n"}:
+                    return f"The file {path} was not written: the user rejected the write."
+                else:
+                    print("Invalid input. Please enter 'yes' or 'no'.")
+
+        result = self._assistant.get_command_executor().write_file(path, content)
+        if not result.ok:
+            return f"The file {path} could not be written: {result.stderr}"
+        return f"The file {path} was written ({len(content.encode())} bytes)."
 
     def data_generator(self, state: DecisionGraphState):
         print("---DATA GENERATOR---")
@@ -362,24 +412,34 @@ class DecisionGraph(GraphBase):
         (action, _, result) = state["action"]
 
         start_time = time.time()
-        evaluator = None
-        while not evaluator or not evaluator.completion:
-            if evaluator:
-                print("Failed generation. Retrying...")
-            evaluator = self._agents["plan_evaluator"].invoke(
-                {"context": context, "data": data, "plan": plan, "step": step, "result": result, "completion": completion})
-        print("---GRADING PLAN---")
-        grader = None
-        while not grader or not grader.score:
-            if grader:
-                print("Failed generation. Retrying...")
-            grader = self._agents["plan_grader"].invoke(
-                {"plan": plan, "completion": evaluator.completion})
+        if self._fused_agents.plan:
+            judge = None
+            while not judge or not judge.completion or not judge.score:
+                if judge:
+                    print("Failed generation. Retrying...")
+                judge = self._agents["plan_judge"].invoke(
+                    {"context": context, "data": data, "plan": plan, "step": step, "result": result, "completion": completion})
+            (completion, score) = (judge.completion, judge.score)
+        else:
+            evaluator = None
+            while not evaluator or not evaluator.completion:
+                if evaluator:
+                    print("Failed generation. Retrying...")
+                evaluator = self._agents["plan_evaluator"].invoke(
+                    {"context": context, "data": data, "plan": plan, "step": step, "result": result, "completion": completion})
+            print("---GRADING PLAN---")
+            grader = None
+            while not grader or not grader.score:
+                if grader:
+                    print("Failed generation. Retrying...")
+                grader = self._agents["plan_grader"].invoke(
+                    {"plan": plan, "completion": evaluator.completion})
+            (completion, score) = (evaluator.completion, grader.score)
         total_time = time.time() - start_time
 
         print("Total time:", total_time)
 
-        return {"plan": (plan, step, evaluator.completion, grader.score)}
+        return {"plan": (plan, step, completion, score)}
 
     def subtask_evaluator(self, state: DecisionGraphState):
         print("---EVALUATING SUBTASK---")
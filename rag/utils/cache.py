@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+
+def make_key(*parts) -> str:
+    """Builds a stable content hash from arbitrary JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf8")).hexdigest()
+
+
+class SqliteCache:
+    """
+    Persistent key/value store backed by a single SQLite table.
+
+    Entries older than `ttl` seconds are treated as misses and dropped, and the
+    least recently accessed entries are evicted once the table grows past
+    `max_entries`. Hits and misses are counted per namespace so that callers
+    sharing a table (e.g. one namespace per agent) can report them separately.
+    """
+
+    def __init__(self, path: str, table: str = "cache", ttl: float | None = None, max_entries: int | None = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._table = table
+        self._ttl = ttl
+        self._max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, namespace TEXT, value BLOB, created REAL, accessed REAL)")
+        self._connection.commit()
+
+        self._hits = Counter()
+        self._misses = Counter()
+
+    def get(self, key: str, namespace: str = ""):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT value, created FROM {self._table} WHERE key = ?", (key,)).fetchone()
+            if row is not None and self._ttl is not None and now - row[1] > self._ttl:
+                self._connection.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+                self._connection.commit()
+                row = None
+
+            if row is None:
+                self._misses[namespace] += 1
+                return None
+
+            self._connection.execute(f"UPDATE {self._table} SET accessed = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self._hits[namespace] += 1
+            return row[0]
+
+    def set(self, key: str, value, namespace: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, namespace, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, value, now, now))
+            if self._max_entries is not None:
+                (count,) = self._connection.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()
+                if count > self._max_entries:
+                    self._connection.execute(
+                        f"DELETE FROM {self._table} WHERE key IN "
+                        f"(SELECT key FROM {self._table} ORDER BY accessed ASC LIMIT ?)",
+                        (count - self._max_entries,))
+            self._connection.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+            self._connection.commit()
+
+    def clear(self, namespace: str | None = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._connection.execute(f"DELETE FROM {self._table}")
+            else:
+                self._connection.execute(f"DELETE FROM {self._table} WHERE namespace = ?", (namespace,))
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        """Returns {namespace: {"hits": int, "misses": int}} for this process."""
+        namespaces = set(self._hits) | set(self._misses)
+        return {namespace: {"hits": self._hits[namespace], "misses": self._misses[namespace]}
+                for namespace in sorted(namespaces)}
+
+    def hit_rate(self) -> float:
+        hits = sum(self._hits.values())
+        total = hits + sum(self._misses.values())
+        return hits / total if total else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
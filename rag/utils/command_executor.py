@@ -1,58 +1,366 @@
+import asyncio
 import os
-import subprocess
+import re
+import secrets
+import signal
+import threading
+import time
+from dataclasses import dataclass
 
-class CommandExecutor:
+# Seconds given to an interrupted command before escalating
+INTERRUPT_GRACE = 2
+READ_SIZE = 65536
+# Without a terminal, an interactive bash fails to restore the terminal state whenever a job is killed
+# by a signal, even with job control off, e.g. after the SIGPIPE of yes in "yes | head"
+TTY_NOISE = re.compile(rb"^bash: \[\d+: \d+ \(\d+\)\] tcsetattr: Inappropriate ioctl for device\n", re.MULTILINE)
+
+
+@dataclass
+class CommandResult:
+    """Outcome of a command run in the persistent shell."""
+
+    command: str
+    exit_code: int
+    stdout: str
+    stderr: str
+    duration: float
+    stdout_bytes: int
+    stderr_bytes: int
+    timed_out: bool = False
+    truncated: bool = False
+    dropped_bytes: int = 0
+    cwd: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0 and not self.timed_out
+
+    @property
+    def output(self) -> str:
+        """stdout followed by stderr, as a terminal would show them."""
+        return "\n".join(part.rstrip("\n") for part in (self.stdout, self.stderr) if part)
+
+
+class BoundedOutput:
+    """Keeps the first and the last bytes of a stream within max_bytes, and counts the bytes dropped in between."""
+
+    def __init__(self, max_bytes: int | None):
+        self._head_budget = max_bytes // 2 if max_bytes else None
+        self._tail_budget = max_bytes - self._head_budget if max_bytes else None
+        self._head = bytearray()
+        self._tail = bytearray()
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+
+    def append(self, data: bytes):
+        self.total_bytes += len(data)
+        if self._head_budget is None:
+            self._head += data
+            return
+        room = self._head_budget - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        self._tail += data
+        if len(self._tail) > self._tail_budget:
+            excess = len(self._tail) - self._tail_budget
+            del self._tail[:excess]
+            self.dropped_bytes += excess
+
+    def text(self) -> str:
+        if not self.dropped_bytes:
+            return (self._head + self._tail).decode(errors="replace")
+        return (self._head.decode(errors="replace")
+                + f"\n[... {self.dropped_bytes} bytes of output truncated ...]\n"
+                + self._tail.decode(errors="replace"))
+
+
+class _Framer:
+    """
+    Finds the end marker of an invocation in a stream. Output is released as soon
+    as it cannot be the beginning of the marker line, which starts with a newline
+    the executor adds in front of it.
+    """
 
-    def __init__(self, password):
+    def __init__(self, marker: bytes):
+        self._marker = b"\n" + marker
+        self._buffer = bytearray()
+        self.done = False
+        self.status = None
 
+    def feed(self, data: bytes) -> bytes:
+        self._buffer += data
+        index = self._buffer.find(self._marker)
+        if index == -1:
+            keep = min(len(self._buffer), len(self._marker) - 1)
+            released = bytes(self._buffer[:len(self._buffer) - keep])
+            del self._buffer[:len(self._buffer) - keep]
+            return released
+
+        released = bytes(self._buffer[:index])
+        del self._buffer[:index]
+        end = self._buffer.find(b"\n", len(self._marker))
+        if end != -1:
+            self.status = self._buffer[len(self._marker):end].decode(errors="replace").lstrip(" ")
+            self.done = True
+        return released
+
+    def flush(self) -> bytes:
+        released = bytes(self._buffer)
+        self._buffer.clear()
+        return released
+
+
+class CommandStream:
+    """
+    Async iterator over the (stream name, bytes) chunks of a running command, the
+    stream name being "stdout" or "stderr". `result` holds the CommandResult
+    once the iteration is over.
+    """
+
+    def __init__(self, executor, command, timeout):
+        self.result = None
+        self._chunks = executor._stream(command, timeout, self)
+
+    def __aiter__(self):
+        return self._chunks
+
+
+class AsyncCommandExecutor:
+    """
+    Persistent bash shell driven through asyncio subprocess pipes.
+
+    Every invocation is framed by a random end marker carrying the exit status
+    and the working directory of the shell, written on stdout and on stderr
+    after the command, so output that looks like a marker cannot end a command
+    early. Output is forwarded as it is read, without any line splitting or
+    whitespace stripping. Commands run one at a time, their input is /dev/null.
+    """
+
+    def __init__(self, password, timeout: float | None = None, max_output_bytes: int | None = None):
         self._password = password
+        self._timeout = timeout
+        self._max_output_bytes = max_output_bytes
+        self._lock = asyncio.Lock()
+        self._shell_process = None
+        self._chunks = None
+        self._readers = []
+        self.cwd = None
 
+    async def start(self):
         home_dir = os.path.expanduser("~")
-        self._shell_process = subprocess.Popen(
-            ["/bin/bash", "-i"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            cwd = home_dir,
+        self._shell_process = await asyncio.create_subprocess_exec(
+            # Without line editing, the interactive shell does not echo the commands on stderr
+            "/bin/bash", "--noediting", "-i",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=home_dir,
             start_new_session=True
         )
+        self._chunks = asyncio.Queue()
+        self._readers = [asyncio.create_task(self._read(name, stream)) for name, stream
+                         in (("stdout", self._shell_process.stdout), ("stderr", self._shell_process.stderr))]
 
-        # Send initial setup command to ensure clean output
-        self._shell_process.stdin.write("export PS1='' && echo SHELL_READY\n")
-        self._shell_process.stdin.flush()
+        # Drop the start up messages and the first prompt
+        marker = self._new_marker()
+        # History expansion would rewrite the commands containing "!", and job control needs a terminal
+        await self._write(f"export PS1='' PS2=''; set +H +m\n{self._end_line(marker)}")
+        framers = {"stdout": _Framer(marker), "stderr": _Framer(marker)}
+        while not all(framer.done for framer in framers.values()):
+            name, data = await self._chunks.get()
+            if data is None:
+                raise RuntimeError("The shell exited during start up")
+            framers[name].feed(data)
+        self.cwd = framers["stdout"].status.partition(" ")[2]
 
-        # Read until we confirm shell is ready
-        while True:
-            line = self._shell_process.stdout.readline().strip()
-            if line == "SHELL_READY":
-                break  # Shell is ready to receive commands
+    async def _read(self, name, stream):
+        while data := await stream.read(READ_SIZE):
+            await self._chunks.put((name, data))
+        await self._chunks.put((name, None))
 
-    def run_command(self, command):
-        """Runs a command in the persistent shell and returns its output."""
-        end_marker = "CMD_DONE"
+    async def _write(self, text):
+        self._shell_process.stdin.write(text.encode())
+        await self._shell_process.stdin.drain()
 
-        if command.strip().startswith("sudo"):
-            # Add -S to allow sudo to read from stdin
-            command = command.replace("sudo", "sudo -S", 1)
-            self._shell_process.stdin.write(f"echo '{self._password}' | {command} ; echo {end_marker}\n")
-        else:
-            self._shell_process.stdin.write(f"{command} ; echo {end_marker}\n")
+    @staticmethod
+    def _new_marker() -> bytes:
+        return f"CMD_DONE_{secrets.token_hex(8)}".encode()
 
-        self._shell_process.stdin.flush()
+    @staticmethod
+    def _end_line(marker: bytes) -> str:
+        # The markers go on their own line so that heredocs and comments in the command stay closed
+        return (f"printf '\\n%s %d %s\\n' {marker.decode()} \"$?\" \"$PWD\"; "
+                f"printf '\\n%s\\n' {marker.decode()} >&2\n")
+
+    def stream(self, command, timeout: float | None = None) -> CommandStream:
+        """Runs a command and returns an async iterator over its output chunks."""
+        return CommandStream(self, command, timeout)
+
+    async def execute(self, command, timeout: float | None = None, on_output=None) -> CommandResult:
+        """Runs a command to completion, passing each output chunk to on_output(stream name, bytes)."""
+        stream = self.stream(command, timeout)
+        async for name, data in stream:
+            if on_output is not None:
+                on_output(name, data)
+        return stream.result
+
+    async def _stream(self, command, timeout, stream):
+        async with self._lock:
+            timeout = timeout or self._timeout
+            line = command
+            if command.strip().startswith("sudo"):
+                # Add -S to allow sudo to read from stdin, and an empty prompt to keep it out of stderr
+                line = f"echo '{self._password}' | " + command.replace("sudo", "sudo -S -p ''", 1)
+
+            marker = self._new_marker()
+            start_time = time.time()
+            await self._write(f"{{ {line}\n}} < /dev/null\n{self._end_line(marker)}")
+
+            framers = {"stdout": _Framer(marker), "stderr": _Framer(marker)}
+            outputs = {"stdout": BoundedOutput(self._max_output_bytes), "stderr": BoundedOutput(self._max_output_bytes)}
+            escalations = [self._interrupt_jobs, self._kill_jobs, self._restart_shell]
+            deadline = start_time + timeout if timeout else None
+            timed_out = False
+            exited = False
+            while not all(framer.done for framer in framers.values()):
+                try:
+                    remaining = max(0.0, deadline - time.time()) if deadline else None
+                    name, data = await asyncio.wait_for(self._chunks.get(), remaining)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    escalation = escalations.pop(0)
+                    print(f"     The command timed out after {timeout}s, {escalation.__doc__}")
+                    await escalation()
+                    if escalation == self._restart_shell:
+                        break
+                    deadline = time.time() + INTERRUPT_GRACE
+                    continue
+
+                if data is None:
+                    # The command exited the shell
+                    data = framers[name].flush()
+                    framers[name].done = exited = True
+                else:
+                    if name == "stderr":
+                        data = TTY_NOISE.sub(b"", data)
+                    data = framers[name].feed(data)
+                if data:
+                    outputs[name].append(data)
+                    yield name, data
+            duration = time.time() - start_time
+
+            exit_code = -1
+            if exited:
+                exit_code = await self._shell_process.wait()
+                await self._restart_shell()
+            elif framers["stdout"].status is not None:
+                status, _, self.cwd = framers["stdout"].status.partition(" ")
+                exit_code = int(status)
+
+            stdout, stderr = outputs["stdout"], outputs["stderr"]
+            stream.result = CommandResult(
+                command=command,
+                exit_code=exit_code,
+                stdout=stdout.text(),
+                stderr=stderr.text(),
+                duration=duration,
+                stdout_bytes=stdout.total_bytes,
+                stderr_bytes=stderr.total_bytes,
+                timed_out=timed_out,
+                truncated=bool(stdout.dropped_bytes or stderr.dropped_bytes),
+                dropped_bytes=stdout.dropped_bytes + stderr.dropped_bytes,
+                cwd=self.cwd,
+            )
+
+    async def _signal_jobs(self, sig):
+        pkill = await asyncio.create_subprocess_exec(
+            "pkill", f"-{sig.name.removeprefix('SIG')}", "-P", str(self._shell_process.pid),
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        await pkill.wait()
+
+    async def _interrupt_jobs(self):
+        """interrupting it."""
+        await self._signal_jobs(signal.SIGINT)
+
+    async def _kill_jobs(self):
+        """killing it."""
+        await self._signal_jobs(signal.SIGKILL)
+        # Loops of builtins run in the shell process itself, which aborts them on SIGINT
+        self._shell_process.send_signal(signal.SIGINT)
+
+    async def _restart_shell(self):
+        """restarting the shell."""
+        await self.close()
+        await self.start()
+
+    async def close(self):
+        """Closes the persistent shell process."""
+        if self._shell_process.returncode is None:
+            self._shell_process.stdin.close()
+            self._shell_process.terminate()
+        await self._shell_process.wait()
+        for reader in self._readers:
+            reader.cancel()
+
+
+class CommandExecutor:
+    """
+    Synchronous wrapper around AsyncCommandExecutor, whose event loop runs in a
+    background thread.
+    """
+
+    def __init__(self, password, timeout: float | None = None, max_output_bytes: int | None = None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+        self._executor = AsyncCommandExecutor(password, timeout=timeout, max_output_bytes=max_output_bytes)
+        self._call(self._executor.start())
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def run(self, command, timeout: float | None = None, on_output=None) -> CommandResult:
+        """
+        Runs a command in the persistent shell and returns its exit code, stdout and stderr.
+
+        on_output(stream name, bytes) is called from the event loop thread with each
+        chunk of output as soon as it is read.
+        """
+        return self._call(self._executor.execute(command, timeout, on_output))
+
+    def run_command(self, command):
+        """Runs a command in the persistent shell and returns its output."""
+        return self.run(command).output
 
-        output_lines = []
-        while True:
-            line = self._shell_process.stdout.readline().strip()
-            if line == end_marker:
-                break  # Command has finished
-            output_lines.append(line)
+    @property
+    def cwd(self) -> str:
+        """Working directory of the shell after the last command."""
+        return self._executor.cwd
 
-        return "\n".join([line.strip() for line in output_lines if end_marker not in line])
+    def write_file(self, path: str, content: str) -> CommandResult:
+        """
+        Writes content to a file without going through the shell, so nothing needs
+        quoting and nothing is expanded but a leading ~. Relative paths are resolved
+        against the shell's working directory, missing parent directories are created.
+        """
+        start_time = time.time()
+        target = os.path.join(self.cwd, os.path.expanduser(path))
+        data = content.encode()
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as file:
+                file.write(data)
+            exit_code, stderr = 0, ""
+        except OSError as error:
+            exit_code, stderr = 1, f"{target}: {error.strerror}"
+        return CommandResult(command=f"write_file {target}", exit_code=exit_code, stdout="", stderr=stderr,
+                             duration=time.time() - start_time, stdout_bytes=0, stderr_bytes=len(stderr.encode()),
+                             cwd=self.cwd)
 
     def close(self):
         """Closes the persistent shell process."""
-        self._shell_process.stdin.close()
-        self._shell_process.terminate()
-        self._shell_process.wait()
\ No newline at end of file
+        self._call(self._executor.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
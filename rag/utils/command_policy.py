@@ -0,0 +1,200 @@
+import os
+import re
+import threading
+from collections import Counter
+
+from rag.utils.shell import parse_command
+
+WRITE_REDIRECTIONS = {">", ">>", "&>", "&>>", ">|", "<>"}
+SAFE_WRITE_TARGETS = {"/dev/null", "/dev/stdout", "/dev/stderr"}
+# Commands running their arguments as another command, which the rules also see unwrapped
+WRAPPERS = {"env", "command", "builtin", "exec", "nice", "nohup", "timeout", "stdbuf", "setsid", "xargs"}
+WRAPPER_OPTIONS_WITH_ARGUMENT = {"-n", "-u", "-s", "-k", "-o", "-e", "-I", "-P", "-L", "-d", "-a", "-E", "-S", "-C"}
+
+
+class CommandPolicy:
+    """
+    Deterministic security classifier run before the LLM security gate.
+
+    The command line is split into simple commands, and each one is matched
+    against the deny, approval and allow rule sets (regular expressions over the
+    space-joined argv, and over the argv run by wrappers such as env or nice). The commands in `home_write` are allowed when every path
+    they touch is inside the home directory or /tmp. Output redirections must
+    target the same safe locations, or anywhere outside the protected paths with
+    approval.
+
+    A command line is denied as soon as one command is denied. It is only
+    decided locally when every command matched a rule, otherwise the decision is
+    deferred to the LLM.
+    """
+
+    def __init__(self, rules, home: str | None = None):
+        self._deny = [re.compile(rule) for rule in rules.deny]
+        self._approval = [re.compile(rule) for rule in rules.approval]
+        self._allow = [re.compile(rule) for rule in rules.allow]
+        self._home_write = set(rules.home_write)
+        self._protected_paths = [path.rstrip("/") for path in rules.protected_paths]
+        self._home = home or os.path.expanduser("~")
+
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def classify(self, command: str, cwd: str | None = None) -> tuple[str, str] | None:
+        """
+        Returns ('yes' | 'no' | 'approval', reason) when the rules are conclusive,
+        None when the LLM has to decide. Relative paths are resolved against cwd,
+        following the `cd` commands of the line, and default to the home directory.
+        """
+        verdict = self._classify(command, cwd or self._home)
+        with self._lock:
+            self._stats["local" if verdict else "deferred"] += 1
+        return verdict
+
+    def classify_path(self, path: str, cwd: str | None = None) -> tuple[str, str]:
+        """
+        Classifies writing a file at path: 'no' for the protected paths, 'approval'
+        for dotfiles (~/.bashrc, ~/.ssh...), paths left with expansions and paths
+        outside the home directory and /tmp, 'yes' anywhere else.
+        """
+        cwd = cwd or self._home
+        if self._is_protected(path, cwd):
+            return "no", f"{path} is a protected path."
+        resolved = self.resolve(path, cwd)
+        if "$" in resolved or "`" in resolved:
+            return "approval", f"{path} contains an expansion."
+        if self._is_hidden(path, cwd):
+            return "approval", f"{path} is a hidden configuration file or directory."
+        if self._is_safe_path(path, cwd):
+            return "yes", f"{path} is inside the home directory or /tmp."
+        return "approval", f"{path} is outside the home directory."
+
+    def is_read_only(self, command: str) -> bool:
+        """True when every simple command is allowed by the rules and nothing is written."""
+        commands = parse_command(command)
+        if not commands or self._has_expansions(commands):
+            return False
+        return all(not simple_command.sudo
+                   and self._matches(self._allow, simple_command)
+                   and all(target in SAFE_WRITE_TARGETS for target in self._written_paths(simple_command))
+                   for simple_command in commands)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._stats["local"] + self._stats["deferred"]
+            return {"local": self._stats["local"], "deferred": self._stats["deferred"],
+                    "local_fraction": self._stats["local"] / total if total else 0.0}
+
+    def _classify(self, command, cwd):
+        commands = parse_command(command)
+        if not commands:
+            return None
+
+        directories = []
+        for simple_command in commands:
+            directories.append(cwd)
+            if self._matches(self._deny, simple_command):
+                return "no", f"'{' '.join(simple_command.argv)}' matches a denied command rule."
+            for target in self._written_paths(simple_command):
+                if self._is_protected(target, cwd):
+                    return "no", f"The command writes to the protected path {target}."
+            if simple_command.argv[:1] == ["cd"]:
+                cwd = self.resolve(simple_command.argv[1] if len(simple_command.argv) > 1 else "~", cwd)
+
+        # Command substitutions, expansions and function definitions hide what actually runs
+        if self._has_expansions(commands):
+            return None
+
+        verdicts = []
+        for simple_command, directory in zip(commands, directories):
+            verdict = self._classify_simple(simple_command, directory)
+            if verdict is None:
+                return None
+            verdicts.append(verdict)
+
+        for verdict, reason in verdicts:
+            if verdict == "approval":
+                return verdict, reason
+        return "yes", "Every command is allowed by the security rules."
+
+    def _classify_simple(self, simple_command, cwd):
+        name = " ".join(simple_command.argv)
+        if self._matches(self._approval, simple_command):
+            return "approval", f"'{name}' matches a command rule requiring approval."
+
+        for target in self._written_paths(simple_command):
+            if not self._is_safe_path(target, cwd):
+                return "approval", f"The command writes to {target}, outside the home directory."
+            if self._is_hidden(target, cwd):
+                return "approval", f"The command writes to {target}, a hidden configuration file or directory."
+
+        if not self._matches(self._allow, simple_command):
+            if not simple_command.argv or simple_command.argv[0] not in self._home_write:
+                return None
+            paths = [argument for argument in simple_command.argv[1:] if not argument.startswith("-")]
+            if not all(self._is_safe_path(path, cwd) for path in paths):
+                return "approval", f"'{name}' modifies files outside the home directory."
+            if any(self._is_hidden(path, cwd) for path in paths):
+                return "approval", f"'{name}' modifies hidden configuration files or directories."
+
+        if simple_command.sudo:
+            return "approval", f"'{name}' runs with super user privileges."
+        return "yes", f"'{name}' is allowed by the security rules."
+
+    @staticmethod
+    def _matches(rules, simple_command):
+        names = {" ".join(simple_command.argv), " ".join(_unwrapped(simple_command.argv))}
+        return any(rule.search(name) for rule in rules for name in names)
+
+    @staticmethod
+    def _written_paths(simple_command):
+        return [target for op, target in simple_command.redirections
+                if op in WRITE_REDIRECTIONS or (op == ">&" and not target.isdigit() and target != "-")]
+
+    @staticmethod
+    def _has_expansions(commands):
+        # Function definitions (`ls() { ...; }`) and subshells hide what actually runs as well
+        if any(simple_command.argv and ("(" in simple_command.argv[0] or simple_command.argv[0] == "function")
+               for simple_command in commands):
+            return True
+        return any("$(" in token or "`" in token or "<(" in token or ">(" in token
+                   for simple_command in commands
+                   for token in simple_command.argv + [target for _, target in simple_command.redirections])
+
+    def resolve(self, path: str, cwd: str | None = None) -> str:
+        """Absolute form of path, relative to cwd (the home directory by default), with ~ and $HOME expanded."""
+        for home in ("~", "$HOME", "${HOME}"):
+            if path == home or path.startswith(home + "/"):
+                path = self._home + path[len(home):]
+                break
+        return os.path.normpath(os.path.join(cwd or self._home, os.path.expanduser(path)))
+
+    def _is_protected(self, path, cwd):
+        resolved = self.resolve(path, cwd)
+        return any(resolved == protected or resolved.startswith(protected + "/") for protected in self._protected_paths)
+
+    def _is_hidden(self, path, cwd):
+        """Dotfiles and dot directories (~/.bashrc, ~/.ssh...) hold configuration that runs code."""
+        if path in SAFE_WRITE_TARGETS:
+            return False
+        return any(part.startswith(".") for part in self.resolve(path, cwd).split("/"))
+
+    def _is_safe_path(self, path, cwd):
+        if path in SAFE_WRITE_TARGETS:
+            return True
+        resolved = self.resolve(path, cwd)
+        return any(resolved == root or resolved.startswith(root + "/") for root in (self._home, "/tmp"))
+
+
+def _unwrapped(argv):
+    """The argv run by the wrappers at the start of argv (env, nice, timeout...), argv itself without wrapper."""
+    while argv and argv[0] in WRAPPERS:
+        wrapper, argv = argv[0], argv[1:]
+        if wrapper == "command" and argv[:1] in (["-v"], ["-V"]):
+            # Only looks the name up
+            return []
+        while argv and (argv[0].startswith("-") or re.match(r"^[A-Za-z_]\w*=", argv[0])):
+            argv = argv[2:] if argv[0] in WRAPPER_OPTIONS_WITH_ARGUMENT else argv[1:]
+        if wrapper == "timeout" and argv:
+            # The duration
+            argv = argv[1:]
+    return argv
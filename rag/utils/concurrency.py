@@ -0,0 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def bounded_map(fn, items, max_workers: int) -> list:
+    """
+    Applies `fn` to every item with at most `max_workers` calls in flight and
+    returns the results in input order. Falls back to a plain loop when
+    `max_workers` is 1 or there is at most one item.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
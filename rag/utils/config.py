@@ -0,0 +1,14 @@
+import os
+from functools import lru_cache
+
+import box
+import yaml
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "config.yml")
+
+
+@lru_cache(maxsize=None)
+def get_config():
+    """Loads config.yml once and returns it as a Box."""
+    with open(CONFIG_PATH, 'r', encoding='utf8') as config_file:
+        return box.Box(yaml.safe_load(config_file))
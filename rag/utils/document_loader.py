@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+
+from rag.utils.cache import SqliteCache, make_key
+from rag.utils.ingest_manifest import file_hash
+
+TEXT_SUFFIXES = {".txt", ".md", ".csv", ".json", ".yml", ".yaml", ".xml", ".html", ".ini", ".cfg", ".conf",
+                 ".log", ".py", ".sh"}
+
+
+def _parse_text(path: str) -> str:
+    with open(path, 'r', encoding='utf8', errors='replace') as file:
+        return file.read()
+
+
+def _parse_pdf(path: str) -> str:
+    from pypdf import PdfReader
+
+    return "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+def _parse_unstructured(path: str) -> str:
+    from langchain_community.document_loaders import UnstructuredFileLoader
+
+    return "\n\n".join(document.page_content for document in UnstructuredFileLoader(path).load())
+
+
+def get_parser(path: str):
+    """Routes a file to its parser by extension, unknown types go through unstructured."""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".pdf":
+        return _parse_pdf
+    if suffix in TEXT_SUFFIXES:
+        return _parse_text
+    return _parse_unstructured
+
+
+def extract_text(path: str) -> str:
+    return get_parser(path)(path)
+
+
+def load_documents(files: list[str], cache: SqliteCache, workers: int) -> list[Document]:
+    """
+    Extracts the text of the files, one Document per file.
+
+    The extracted text is cached by file hash and parser, so unchanged files are
+    never parsed again. The remaining files are parsed in a process pool.
+    """
+    keys = {file: make_key(file_hash(file), get_parser(file).__name__) for file in files}
+
+    texts = {}
+    for file in files:
+        cached = cache.get(keys[file], "extracted_text")
+        if cached is not None:
+            texts[file] = cached
+
+    missing = [file for file in files if file not in texts]
+    if len(missing) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+            extracted = list(pool.map(extract_text, missing))
+    else:
+        extracted = [extract_text(file) for file in missing]
+
+    for file, text in zip(missing, extracted):
+        texts[file] = text
+        cache.set(keys[file], text, "extracted_text")
+    print(f"Parsed {len(missing)} files, {len(files) - len(missing)} extracted texts reused from the cache.")
+
+    return [Document(page_content=texts[file], metadata={"source": file}) for file in files]
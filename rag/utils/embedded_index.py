@@ -0,0 +1,192 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from rag.utils.vector_backend import VectorBackend
+
+# Below this many chunks an exact scan is faster than probing clusters
+APPROXIMATE_MIN_CHUNKS = 2048
+
+
+class EmbeddedBackend(VectorBackend):
+    """
+    In-process vector index for single host deployments and benchmarks.
+
+    Normalized float32 vectors are stored in a flat file that is memory-mapped
+    for search, and the chunk ids, texts and metadata live in SQLite with the row
+    of their vector. The rows of deleted chunks are recorded as free and reused
+    by the next new chunks, the file only grows when no row is free. Exact search scores every vector with one matrix product.
+    Approximate search clusters the vectors with spherical k-means and only
+    scans the `n_probe` clusters closest to the query.
+    """
+
+    def __init__(self, directory: str, index_name: str, search: str = "exact", n_probe: int = 4):
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, f"{index_name}.f32")
+        self._search = search
+        self._n_probe = n_probe
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(directory, f"{index_name}.sqlite"), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, text TEXT, metadata TEXT)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+        self._connection.commit()
+
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self._dim = int(row[0]) if row else None
+        self._record_free_rows()
+
+        self._matrix = None
+        self._active = None
+        self._clusters = None
+
+    def _file_rows(self):
+        if self._dim is None or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self._dim * 4)
+
+    def _record_free_rows(self):
+        # Indexes written before the free list have their deleted rows recorded once
+        if self._connection.execute("SELECT 1 FROM meta WHERE key = 'free_rows'").fetchone():
+            return
+        used = {row for (row,) in self._connection.execute("SELECT row FROM chunks")}
+        self._connection.executemany("INSERT OR IGNORE INTO free_rows (row) VALUES (?)",
+                                     [(row,) for row in range(self._file_rows()) if row not in used])
+        self._connection.execute("INSERT INTO meta (key, value) VALUES ('free_rows', '1')")
+        self._connection.commit()
+
+    def _invalidate(self):
+        self._matrix = None
+        self._active = None
+        self._clusters = None
+
+    def upsert(self, ids, texts, metadatas, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._connection.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(self._dim),))
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match the index dimension {self._dim}")
+
+            existing = dict(self._select("SELECT id, row FROM chunks WHERE id IN ({})", ids))
+            new_ids = list(dict.fromkeys(chunk_id for chunk_id in ids if chunk_id not in existing))
+            free = [row for (row,) in self._connection.execute("SELECT row FROM free_rows ORDER BY row LIMIT ?",
+                                                               (len(new_ids),))]
+            self._select("DELETE FROM free_rows WHERE row IN ({})", free)
+            next_row = self._file_rows()
+            for chunk_id in new_ids:
+                if free:
+                    existing[chunk_id] = free.pop(0)
+                else:
+                    existing[chunk_id] = next_row
+                    next_row += 1
+            rows = [existing[chunk_id] for chunk_id in ids]
+
+            mode = 'r+b' if os.path.exists(self._vectors_path) else 'w+b'
+            with open(self._vectors_path, mode) as vectors_file:
+                for row, vector in zip(rows, vectors):
+                    vectors_file.seek(row * self._dim * 4)
+                    vectors_file.write(vector.tobytes())
+
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(row, chunk_id, text, json.dumps(metadata))
+                 for row, chunk_id, text, metadata in zip(rows, ids, texts, metadatas)])
+            self._connection.commit()
+            self._invalidate()
+
+    def delete(self, ids):
+        # The vector rows stay in the file, masked out and recorded as free for the next new chunks
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                self._connection.execute(
+                    f"INSERT OR IGNORE INTO free_rows (row) SELECT row FROM chunks WHERE id IN ({placeholders})", batch)
+                self._connection.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+            self._connection.commit()
+            self._invalidate()
+
+    def search(self, vector, k):
+        with self._lock:
+            if self._dim is None or not os.path.exists(self._vectors_path):
+                return []
+            self._load()
+            query = np.asarray(vector, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1
+
+            if self._search == "approximate" and self._active.sum() >= APPROXIMATE_MIN_CHUNKS:
+                candidates = self._probe(query)
+            else:
+                candidates = np.flatnonzero(self._active)
+            if not len(candidates):
+                return []
+
+            scores = self._matrix[candidates] @ query
+            k = min(k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            rows = [int(candidates[i]) for i in top]
+
+            chunks = {row: (chunk_id, text, json.loads(metadata)) for row, chunk_id, text, metadata
+                      in self._select("SELECT row, id, text, metadata FROM chunks WHERE row IN ({})", rows)}
+            return [(*chunks[row], float(scores[i])) for row, i in zip(rows, top)]
+
+    def chunks(self):
+        with self._lock:
+            return [(chunk_id, text, json.loads(metadata)) for chunk_id, text, metadata
+                    in self._connection.execute("SELECT id, text, metadata FROM chunks ORDER BY row")]
+
+    def _load(self):
+        if self._matrix is None:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r').reshape(-1, self._dim)
+            self._active = np.zeros(len(self._matrix), dtype=bool)
+            rows = [row for (row,) in self._connection.execute("SELECT row FROM chunks")]
+            self._active[rows] = True
+
+    def _probe(self, query):
+        if self._clusters is None:
+            self._clusters = self._build_clusters()
+        (centroids, assignments, rows) = self._clusters
+
+        probed = np.argsort(-(centroids @ query))[:self._n_probe]
+        return rows[np.isin(assignments, probed)]
+
+    def _build_clusters(self, iterations: int = 10):
+        rows = np.flatnonzero(self._active)
+        vectors = np.asarray(self._matrix[rows])
+        n_clusters = max(1, int(math.sqrt(len(rows))))
+
+        rng = np.random.default_rng(0)
+        centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cluster in range(n_clusters):
+                members = vectors[assignments == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[cluster] = centroid / (np.linalg.norm(centroid) or 1)
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        return centroids, assignments, rows
+
+    def _select(self, query, values):
+        results = []
+        for start in range(0, len(values), 500):
+            batch = list(values[start:start + 500])
+            results.extend(self._connection.execute(query.format(','.join('?' * len(batch))), batch).fetchall())
+        return results
+
+    def close(self):
+        with self._lock:
+            self._matrix = None
+            self._connection.close()
@@ -1,8 +1,69 @@
+import time
+from array import array
+from functools import lru_cache
+
+from langchain_core.embeddings import Embeddings
 from langchain_ollama import OllamaEmbeddings
 
+from rag.utils.cache import SqliteCache, make_key
+from rag.utils.concurrency import bounded_map
+from rag.utils.config import get_config
 
 
 embeddings = OllamaEmbeddings(model="mxbai-embed-large")
 
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings front end that batches requests to the embedding model, runs the
+    batches on parallel workers and keeps every vector in a persistent cache keyed
+    by (model, text hash), so a chunk is never embedded twice.
+    """
+
+    def __init__(self, model_embeddings, cache: SqliteCache, batch_size: int, workers: int):
+        self._embeddings = model_embeddings
+        self._cache = cache
+        self._batch_size = batch_size
+        self._workers = workers
+        self._embedded = 0
+        self._embedding_time = 0.0
+
+    def _key(self, text):
+        return make_key(self._embeddings.model, text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = {}
+        for text in texts:
+            if text not in vectors:
+                cached = self._cache.get(self._key(text), self._embeddings.model)
+                vectors[text] = None if cached is None else array('f', cached).tolist()
+
+        missing = [text for text, vector in vectors.items() if vector is None]
+        if missing:
+            start_time = time.time()
+            batches = [missing[i:i + self._batch_size] for i in range(0, len(missing), self._batch_size)]
+            for batch, batch_vectors in zip(batches, bounded_map(self._embeddings.embed_documents, batches, self._workers)):
+                for text, vector in zip(batch, batch_vectors):
+                    vectors[text] = vector
+                    self._cache.set(self._key(text), array('f', vector).tobytes(), self._embeddings.model)
+            self._embedding_time += time.time() - start_time
+            self._embedded += len(missing)
+
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        return {
+            "embedded": self._embedded,
+            "chunks_per_second": self._embedded / self._embedding_time if self._embedding_time else 0.0,
+            "cache_hit_rate": self._cache.hit_rate(),
+        }
+
+
+@lru_cache(maxsize=None)
 def get_embeddings():
-    return embeddings
\ No newline at end of file
+    cfg = get_config()
+    cache = SqliteCache(cfg.EMBEDDING_CACHE_PATH, table="embeddings")
+    return CachedEmbeddings(embeddings, cache, cfg.EMBEDDING_BATCH_SIZE, cfg.EMBEDDING_WORKERS)
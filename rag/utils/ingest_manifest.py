@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def list_files(path: str) -> list[str]:
+    """Lists the non hidden files under path, like DirectoryLoader(glob="**/[!.]*")."""
+    return sorted(str(file) for file in Path(path).glob("**/[!.]*") if file.is_file())
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    Record of the files ingested in the vector store.
+
+    Each entry maps a file path to its mtime, size, content hash and the ids of
+    the chunks stored for it. Files whose mtime and size are unchanged are not
+    hashed again, and a file that was touched but kept the same content is not
+    reported as changed.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as manifest_file:
+                self._entries = json.load(manifest_file)
+
+    def paths(self) -> set[str]:
+        return set(self._entries)
+
+    def chunk_ids(self, path: str) -> list[str]:
+        return self._entries.get(path, {}).get("chunks", [])
+
+    def diff(self, files: list[str]) -> tuple[list[str], list[str]]:
+        """Returns the new or modified files and the files that disappeared since the last ingestion."""
+        changed = []
+        for file in files:
+            stat = os.stat(file)
+            entry = self._entries.get(file)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            if entry and entry["hash"] == file_hash(file):
+                entry["mtime"] = stat.st_mtime
+                continue
+            changed.append(file)
+
+        removed = sorted(self.paths() - set(files))
+        return changed, removed
+
+    def update(self, path: str, chunk_ids: list[str]) -> None:
+        stat = os.stat(path)
+        self._entries[path] = {"mtime": stat.st_mtime, "size": stat.st_size,
+                               "hash": file_hash(path), "chunks": chunk_ids}
+
+    def remove(self, path: str) -> None:
+        self._entries.pop(path, None)
+
+    def save(self) -> None:
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self._path, 'w', encoding='utf8') as manifest_file:
+            json.dump(self._entries, manifest_file, indent=2)
@@ -0,0 +1,59 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class BM25Index:
+    """In-memory BM25 index over the chunks of a vector index."""
+
+    def __init__(self, chunks, k1: float = 1.5, b: float = 0.75):
+        self._k1 = k1
+        self._b = b
+        self._chunks = []
+        self._lengths = []
+        self._postings = defaultdict(list)
+
+        for (chunk_id, text, metadata) in chunks:
+            frequencies = Counter(tokenize(text))
+            position = len(self._chunks)
+            self._chunks.append((chunk_id, text, metadata))
+            self._lengths.append(sum(frequencies.values()))
+            for term, frequency in frequencies.items():
+                self._postings[term].append((position, frequency))
+
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def search(self, query: str, k: int) -> list[tuple[str, str, dict, float]]:
+        """Returns the k best matching chunks as (id, text, metadata, bm25 score), best first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self._chunks) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                norm = self._k1 * (1 - self._b + self._b * self._lengths[position] / self._average_length)
+                scores[position] += idf * frequency * (self._k1 + 1) / (frequency + norm)
+
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(*self._chunks[position], score) for position, score in best]
+
+
+def reciprocal_rank_fusion(rankings, weights, k: int = 60) -> list[tuple[str, float]]:
+    """
+    Fuses ranked result lists of (id, ...) tuples with weighted reciprocal rank fusion.
+
+    Returns (id, fused score) pairs, best first.
+    """
+    scores = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, result in enumerate(ranking):
+            scores[result[0]] += weight / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
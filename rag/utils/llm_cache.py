@@ -0,0 +1,61 @@
+import json
+from functools import lru_cache
+
+from rag.utils.cache import SqliteCache, make_key
+from rag.utils.config import get_config
+from rag.utils.llm import llm
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache():
+    """Returns the shared LLM response cache, or None when it is disabled in config.yml."""
+    cfg = get_config()
+    if not cfg.LLM_CACHE:
+        return None
+    return SqliteCache(cfg.LLM_CACHE_PATH, table="llm_responses",
+                       ttl=cfg.LLM_CACHE_TTL, max_entries=cfg.LLM_CACHE_MAX_ENTRIES)
+
+
+def _is_complete(output) -> bool:
+    return output is not None and all(value for value in output.model_dump().values())
+
+
+class CachedChain:
+    """
+    A `prompt | structured_llm` chain memoized in the LLM response cache.
+
+    Responses are keyed by the agent name, the model, a hash of the prompt
+    template and output schema, and a hash of the invocation inputs. The LLM
+    runs at temperature 0, so a hit returns the same answer the model would
+    have produced.
+
+    Only outputs accepted by `accept` are stored: the graph nodes retry on
+    empty or invalid generations, and caching those would replay them forever.
+    """
+
+    def __init__(self, name, prompt, structured_llm, schema, accept=_is_complete):
+        self._name = name
+        self._schema = schema
+        self._accept = accept
+        self._chain = prompt | structured_llm
+        self._fingerprint = make_key(name, llm().model, prompt.pretty_repr(),
+                                     json.dumps(schema.model_json_schema(), sort_keys=True))
+
+    @property
+    def name(self):
+        return self._name
+
+    def invoke(self, inputs, config=None):
+        cache = get_llm_cache()
+        if cache is None:
+            return self._chain.invoke(inputs, config)
+
+        key = make_key(self._fingerprint, inputs)
+        cached = cache.get(key, self._name)
+        if cached is not None:
+            return self._schema.model_validate_json(cached)
+
+        output = self._chain.invoke(inputs, config)
+        if self._accept(output):
+            cache.set(key, output.model_dump_json(), self._name)
+        return output
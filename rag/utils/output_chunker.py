@@ -0,0 +1,44 @@
+import re
+
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+class OutputChunker:
+    """
+    Groups command output into chunks of whole lines of at most max_chars, a
+    longer line making a chunk of its own. Text can be fed as it is produced,
+    the chunks are returned as soon as they are complete.
+    """
+
+    def __init__(self, max_chars: int = 3000):
+        self._max_chars = max_chars
+        self._partial_line = ""
+        self._lines = []
+        self._length = 0
+
+    def feed(self, text: str) -> list[str]:
+        lines = LINE_BREAK.split(self._partial_line + text)
+        self._partial_line = lines.pop()
+        chunks = []
+        for line in lines:
+            chunks.extend(self._add(line))
+        return chunks
+
+    def flush(self) -> list[str]:
+        chunks = self._add(self._partial_line) if self._partial_line else []
+        self._partial_line = ""
+        if self._lines:
+            chunks.append("\n".join(self._lines))
+            self._lines = []
+            self._length = 0
+        return chunks
+
+    def _add(self, line):
+        chunks = []
+        if self._lines and self._length + len(line) + 1 > self._max_chars:
+            chunks.append("\n".join(self._lines))
+            self._lines = []
+            self._length = 0
+        self._lines.append(line)
+        self._length += len(line) + 1  # +1 for newline
+        return chunks
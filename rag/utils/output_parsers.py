@@ -0,0 +1,198 @@
+import json
+import re
+
+from rag.utils.shell import parse_command
+
+# (program, required short flags, excluded short flags, parser), searched in registration order
+PARSERS = []
+
+
+def output_parser(program: str, flags: str = "", excluded: str = ""):
+    """
+    Registers a parser for the output of `program` when it is called with at
+    least the given short flags and none of the excluded ones. A parser returns
+    a list of JSON rows, or None when the output is not in the expected format.
+    """
+
+    def register(parse):
+        PARSERS.append((program, set(flags), set(excluded), parse))
+        return parse
+
+    return register
+
+
+def _short_flags(arguments):
+    flags = set()
+    for argument in arguments:
+        if argument.startswith("--"):
+            continue
+        if argument.startswith("-"):
+            flags.update(argument[1:])
+    return flags
+
+
+def find_parser(command: str):
+    """
+    Returns the parser for a command made of a single simple command without
+    redirections and without sudo, or None when no parser applies.
+    """
+    commands = parse_command(command)
+    if not commands or len(commands) != 1:
+        return None
+    (simple_command,) = commands
+    if not simple_command.argv or simple_command.redirections or simple_command.sudo:
+        return None
+    if any("$" in token or "`" in token or "*" in token for token in simple_command.argv):
+        return None
+
+    program, arguments = simple_command.argv[0], simple_command.argv[1:]
+    flags = _short_flags(arguments)
+    for name, required_flags, excluded_flags, parse in PARSERS:
+        if name == program and required_flags <= flags and not excluded_flags & flags:
+            return parse
+    return None
+
+
+def parse_output(command: str, output: str, max_chars: int | None = None) -> str | None:
+    """
+    Returns the output of a known command as compact JSON rows, or None. Rows
+    longer than max_chars are not returned either, the output is then left to
+    the analyser.
+    """
+    parse = find_parser(command)
+    if parse is None:
+        return None
+    rows = parse(output)
+    if rows is None:
+        return None
+    parsed = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    if max_chars is not None and len(parsed) > max_chars:
+        return None
+    return parsed
+
+
+def _uniform_numbers(rows, columns):
+    """Turns the columns whose values are all digits into ints, the others stay strings."""
+    for column in columns:
+        values = [row[column] for row in rows if column in row]
+        if values and all(isinstance(value, str) and value.isdigit() for value in values):
+            for row in rows:
+                if column in row:
+                    row[column] = int(row[column])
+    return rows
+
+
+LS_LONG_ENTRY = re.compile(
+    r"^(?P<permissions>[-bcdlps][-rwxsStT]{9}[.+@]?)\s+(?P<links>\d+)\s+(?P<owner>\S+)\s+(?P<group>\S+)\s+"
+    r"(?P<size>\d+(?:,\s*\d+)?|[\d.]+[KMGTPE]?)\s+(?P<modified>\w{3}\s+\d{1,2}\s+(?:\d{1,2}:\d{2}|\d{4}))\s(?P<name>.+)$")
+FILE_TYPES = {"-": "file", "d": "directory", "l": "link", "b": "block device", "c": "character device",
+              "p": "pipe", "s": "socket"}
+
+
+def _listings(output):
+    """Splits an ls output in (directory, lines) sections, directory being None for a single listing."""
+    directory, lines, sections = None, [], []
+    for line in output.splitlines():
+        if line.endswith(":") and not LS_LONG_ENTRY.match(line):
+            if lines or directory is not None:
+                sections.append((directory, lines))
+            directory, lines = line[:-1], []
+        elif line.strip():
+            lines.append(line)
+    sections.append((directory, lines))
+    return sections
+
+
+@output_parser("ls", "l", excluded="mCx")
+def parse_ls_long(output):
+    rows = []
+    for directory, lines in _listings(output):
+        for line in lines:
+            if line.startswith("total "):
+                continue
+            entry = LS_LONG_ENTRY.match(line)
+            if not entry:
+                return None
+            row = entry.groupdict()
+            row["type"] = FILE_TYPES.get(row["permissions"][0], "other")
+            row["links"] = int(row["links"])
+            row["modified"] = " ".join(row["modified"].split())
+            if row["type"] == "link" and " -> " in row["name"]:
+                row["name"], row["target"] = row["name"].split(" -> ", 1)
+            if directory is not None:
+                row["directory"] = directory
+            rows.append(row)
+    # Sizes are strings for every row when one of them is human readable (ls -lh)
+    return _uniform_numbers(rows, ["size"])
+
+
+# Comma separated (-m) and multi-column (-C, -x) listings hold several names per line
+@output_parser("ls", excluded="mCx")
+def parse_ls(output):
+    rows = []
+    for directory, lines in _listings(output):
+        for line in lines:
+            row = {"name": line}
+            if directory is not None:
+                row["directory"] = directory
+            rows.append(row)
+    return rows
+
+
+@output_parser("whoami")
+def parse_whoami(output):
+    lines = output.split()
+    return [{"user": lines[0]}] if len(lines) == 1 else None
+
+
+@output_parser("pwd")
+def parse_pwd(output):
+    path = output.strip()
+    return [{"path": path}] if path.startswith("/") and "\n" not in path else None
+
+
+IP_INTERFACE = re.compile(r"^\d+:\s+(?P<interface>[^:@\s]+)(?:@\S+)?:\s+<(?P<flags>[^>]*)>(?P<attributes>.*)$")
+
+
+def _parse_ip_addr(output):
+    rows = []
+    for line in output.splitlines():
+        interface = IP_INTERFACE.match(line)
+        if interface:
+            attributes = interface.group("attributes").split()
+            settings = dict(zip(attributes[::2], attributes[1::2]))
+            rows.append({"interface": interface.group("interface"), "state": settings.get("state"),
+                         "mtu": int(settings["mtu"]) if settings.get("mtu", "").isdigit() else None,
+                         "flags": interface.group("flags").split(","), "mac": None, "ipv4": [], "ipv6": []})
+            continue
+        fields = line.split()
+        if not fields or not rows:
+            continue
+        if fields[0].startswith("link/") and len(fields) > 1:
+            rows[-1]["mac"] = fields[1]
+        elif fields[0] == "inet" and len(fields) > 1:
+            rows[-1]["ipv4"].append(fields[1])
+        elif fields[0] == "inet6" and len(fields) > 1:
+            rows[-1]["ipv6"].append(fields[1])
+    return rows or None
+
+
+@output_parser("ip")
+def parse_ip(output):
+    # Only `ip addr` and its abbreviations, other objects are left to the analyser
+    return _parse_ip_addr(output) if IP_INTERFACE.match(output.lstrip().split("\n", 1)[0]) else None
+
+
+@output_parser("df")
+def parse_df(output):
+    lines = [line for line in output.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith("Filesystem"):
+        return None
+    columns = [column.lower() for column in lines[0].replace("Mounted on", "Mounted_on").split()]
+    rows = []
+    for line in lines[1:]:
+        values = line.split(None, len(columns) - 1)
+        if len(values) != len(columns):
+            return None
+        rows.append(dict(zip(columns, values)))
+    return _uniform_numbers(rows, columns)
@@ -0,0 +1,128 @@
+import bisect
+import re
+from dataclasses import dataclass
+
+from rag.utils.keyword_index import BM25Index
+
+VARIABLE_PARTS = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|0x[0-9a-f]+|[0-9a-f]{12,}|\d+",
+                            re.IGNORECASE)
+# Lines worth keeping whatever the query, e.g. the reason of a failure
+SIGNAL_WORDS = re.compile(r"\b(error|errors|failed|failure|fatal|denied|warning|not found|no such|cannot|unable)\b",
+                          re.IGNORECASE)
+# Lines always kept at the beginning and the end of the output, where tools print headers and summaries
+EDGE_LINES = 3
+# Shorter runs of similar lines are kept, they usually are distinct values (ports, file names...)
+MIN_COLLAPSED_RUN = 5
+
+
+@dataclass
+class Reduction:
+    text: str
+    input_bytes: int
+    output_bytes: int
+    duplicates: int
+    collapsed: int
+    omitted: int
+
+
+def shape(line: str) -> str:
+    """The line with its numbers, hashes and ids replaced, lines of the same shape only differ by these values."""
+    return VARIABLE_PARTS.sub("#", line.strip())
+
+
+def compact_lines(lines: list[str], min_run: int = MIN_COLLAPSED_RUN) -> tuple[list[str], int, int]:
+    """
+    Drops the repeated lines and collapses the runs of at least min_run
+    consecutive lines of the same shape into their first line followed by a
+    count. Returns the lines and the number of duplicated and collapsed lines.
+    """
+    seen = set()
+    compacted = []
+    duplicates = collapsed = 0
+    run_shape, run = None, []
+
+    def close_run():
+        nonlocal collapsed
+        if len(run) >= min_run:
+            compacted.append(f"[... {len(run) - 1} similar lines]")
+            collapsed += len(run) - 1
+        else:
+            compacted.extend(run[1:])
+
+    for line in lines:
+        if not line.strip():
+            continue
+        if line in seen:
+            duplicates += 1
+            continue
+        seen.add(line)
+
+        line_shape = shape(line)
+        if line_shape == run_shape:
+            run.append(line)
+            continue
+        close_run()
+        compacted.append(line)
+        run_shape, run = line_shape, [line]
+    close_run()
+    return compacted, duplicates, collapsed
+
+
+def reduce_output(output: str, query: str, max_chars: int | None = None) -> Reduction:
+    """
+    Shrinks a command output longer than max_chars before it is analysed, a
+    shorter output is returned as is.
+
+    Repeated lines are dropped and long runs of similar lines collapsed. When the
+    rest is still longer than max_chars, the lines are ranked by BM25 relevance
+    to the query (the task, the command and its description). The first and last
+    lines and the lines reporting errors come first, then the best ranked lines,
+    and they are kept within max_chars in their original order.
+    """
+    if max_chars is None or len(output) <= max_chars:
+        return Reduction(text=output, input_bytes=len(output.encode()), output_bytes=len(output.encode()),
+                         duplicates=0, collapsed=0, omitted=0)
+
+    lines, duplicates, collapsed = compact_lines(output.splitlines())
+    text = "\n".join(lines)
+    omitted = 0
+
+    if len(text) > max_chars:
+        edges = set(range(min(EDGE_LINES, len(lines)))) | set(range(max(0, len(lines) - EDGE_LINES), len(lines)))
+        signals = [position for position, line in enumerate(lines) if SIGNAL_WORDS.search(line)]
+        ranked = [int(position) for position, *_ in
+                  BM25Index([(str(position), line, {}) for position, line in enumerate(lines)]).search(query, len(lines))]
+
+        def marker_length(gap):
+            return len(f"[... {gap} lines omitted]") + 1 if gap > 0 else 0
+
+        # The omission markers count in the budget: a kept line splits the gap around it in two
+        kept, length = [], marker_length(len(lines))
+        # Lines without any query term fill the remaining budget in their original order
+        for position in [*sorted(edges), *signals, *ranked, *range(len(lines))]:
+            index = bisect.bisect_left(kept, position)
+            if index < len(kept) and kept[index] == position:
+                continue
+            before = kept[index - 1] if index > 0 else -1
+            after = kept[index] if index < len(kept) else len(lines)
+            added = (len(lines[position]) + 1 + marker_length(position - before - 1)
+                     + marker_length(after - position - 1) - marker_length(after - before - 1))
+            if length + added > max_chars:
+                continue
+            kept.insert(index, position)
+            length += added
+
+        selected = []
+        previous = -1
+        for position in kept:
+            if position - previous > 1:
+                selected.append(f"[... {position - previous - 1} lines omitted]")
+            selected.append(lines[position])
+            previous = position
+        if previous < len(lines) - 1:
+            selected.append(f"[... {len(lines) - 1 - previous} lines omitted]")
+        omitted = len(lines) - len(kept)
+        text = "\n".join(selected)
+
+    return Reduction(text=text, input_bytes=len(output.encode()), output_bytes=len(text.encode()),
+                     duplicates=duplicates, collapsed=collapsed, omitted=omitted)
@@ -0,0 +1,199 @@
+import os
+import re
+import shlex
+import shutil
+import subprocess
+from dataclasses import dataclass, field
+
+SEPARATORS = {";", "&&", "||", "|", "|&", "&", "\n", ";;"}
+REDIRECTIONS = {">", ">>", "<", "<<", "<<-", "<<<", ">&", "<&", "&>", "&>>", ">|", "<>"}
+KEYWORDS = {"if", "then", "else", "elif", "fi", "do", "done", "while", "until", "!", "{", "}", "(", ")", "time"}
+SUDO_OPTIONS_WITH_ARGUMENT = {"-u", "-g", "-p", "-C", "-D", "-h", "-r", "-t", "-U"}
+COMMAND_NAME = re.compile(r"^[\w.+@:-]+$|^[~/][\w./+@:-]*$")
+# Commands looking a program up, the programs they name are not required to exist
+LOOKUP_PROGRAMS = {"which", "command", "type", "hash", "whereis", "test", "[", "[["}
+PACKAGE_MANAGERS = {"apt", "apt-get", "aptitude", "dpkg", "dnf", "yum", "zypper", "pacman", "apk", "snap", "flatpak",
+                    "brew", "pip", "pip3", "pipx", "uv", "conda", "mamba", "npm", "yarn", "pnpm", "gem", "cargo", "go"}
+INSTALL_SUBCOMMANDS = {"install", "i", "in", "add", "get", "-i", "-S", "-Sy", "-Syu", "-U"}
+# Commands after which any program may exist: sourced scripts and PATH changes
+PATH_CHANGE = re.compile(r"(^|[\s;&|(])(export\s+)?PATH=")
+
+
+@dataclass
+class SimpleCommand:
+    """One command of a shell command line, with its redirections and how it is chained to the previous one."""
+
+    argv: list[str]
+    redirections: list[tuple[str, str]] = field(default_factory=list)
+    sudo: bool = False
+    operator: str = ""
+
+
+def parse_command(command: str) -> list[SimpleCommand] | None:
+    """
+    Splits a command line into simple commands on ;, &&, ||, |, & and newlines.
+
+    Leading variable assignments and shell keywords are dropped, `sudo` and its
+    options are stripped from the argv and recorded in the `sudo` flag, and
+    heredoc bodies are skipped. Returns None when the line cannot be tokenized.
+    """
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=";&|<>\n")
+    lexer.whitespace = " \t\r"
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    try:
+        tokens = list(lexer)
+    except ValueError:
+        return None
+
+    commands = []
+    current = SimpleCommand(argv=[])
+    heredocs = []
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.startswith("#") and not current.argv:
+            while index < len(tokens) and tokens[index] != "\n":
+                index += 1
+            continue
+        if token in SEPARATORS:
+            if current.argv or current.redirections:
+                commands.append(current)
+            current = SimpleCommand(argv=[], operator=token)
+            index += 1
+            if token == "\n" and heredocs:
+                # Skip the heredoc bodies up to their delimiter lines
+                for delimiter in heredocs:
+                    while index < len(tokens) and not (tokens[index] == delimiter
+                                                       and tokens[index - 1] == "\n"):
+                        index += 1
+                    index += 1
+                heredocs = []
+            continue
+        if token in REDIRECTIONS:
+            target = tokens[index + 1] if index + 1 < len(tokens) else ""
+            if current.argv and current.argv[-1].isdigit() and tokens[index - 1] == current.argv[-1]:
+                current.argv.pop()
+            current.redirections.append((token, target))
+            if token in ("<<", "<<-"):
+                heredocs.append(target)
+            index += 2
+            continue
+        if not current.argv and (token in KEYWORDS or re.match(r"^[A-Za-z_]\w*=", token)):
+            index += 1
+            continue
+        if not current.argv and token == "sudo":
+            current.sudo = True
+            index += 1
+            while index < len(tokens) and tokens[index].startswith("-"):
+                index += 2 if tokens[index] in SUDO_OPTIONS_WITH_ARGUMENT else 1
+            continue
+        current.argv.append(token)
+        index += 1
+
+    if current.argv or current.redirections:
+        commands.append(current)
+    return commands
+
+
+def syntax_error(command: str) -> str | None:
+    """Parses the command with `bash -n` and returns bash's error message, if any."""
+    try:
+        result = subprocess.run(["/bin/bash", "-n"], input=command, capture_output=True, text=True, timeout=5)
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        return result.stderr.strip() or "bash -n rejected the command"
+    return None
+
+
+def known_commands(executor=None) -> frozenset:
+    """
+    Aliases, builtins, keywords, functions and PATH programs known to the shell
+    session of the executor, or to a new interactive bash without executor.
+    """
+    if executor is not None:
+        return frozenset(executor.run("compgen -c").stdout.split())
+    try:
+        result = subprocess.run(["/bin/bash", "-i", "-c", "compgen -c"], capture_output=True, text=True,
+                                timeout=10, stdin=subprocess.DEVNULL, cwd=os.path.expanduser("~"))
+    except subprocess.TimeoutExpired:
+        return frozenset()
+    return frozenset(result.stdout.split())
+
+
+def _defined_names(simple_command: SimpleCommand) -> list[str]:
+    """Names of the functions and aliases a command defines."""
+    argv = simple_command.argv
+    if argv[0] == "function" and len(argv) > 1:
+        return [argv[1].split("(")[0]]
+    if "(" in argv[0]:
+        return [argv[0].split("(")[0]]
+    if argv[0] == "alias":
+        return [argument.split("=")[0] for argument in argv[1:] if "=" in argument]
+    return []
+
+
+def _installs(simple_command: SimpleCommand) -> bool:
+    """True for package installations, and for scripts piped into a shell (curl ... | sh)."""
+    argv = simple_command.argv
+    if argv[0] in ("sh", "bash") and simple_command.operator == "|":
+        return True
+    return argv[0] in PACKAGE_MANAGERS and any(argument in INSTALL_SUBCOMMANDS for argument in argv[1:])
+
+
+def missing_programs(commands: list[SimpleCommand], known: frozenset) -> list[str]:
+    """
+    Returns the command names that are neither in `known` nor on PATH. Names
+    built from expansions, and relative paths (which depend on the shell's
+    working directory), are not checked. Neither are the programs looked up
+    (`which docker && docker ps`) or defined (`f() { ...; }; f`) earlier on the
+    line, nor any program run after an installation (`npm i -g x && x`) or a
+    sourced script.
+    """
+    missing = []
+    looked_up = set()
+    installed = False
+    for simple_command in commands:
+        if not simple_command.argv:
+            continue
+        name = simple_command.argv[0]
+        if name in LOOKUP_PROGRAMS:
+            looked_up.update(simple_command.argv[1:])
+        looked_up.update(_defined_names(simple_command))
+        if _installs(simple_command) or name in ("source", "."):
+            installed = True
+        if installed or name in looked_up:
+            continue
+        if not COMMAND_NAME.match(name) or (("/" in name) and not name.startswith(("/", "~"))):
+            continue
+        if name.startswith(("/", "~")):
+            path = os.path.expanduser(name)
+            if not (os.path.isfile(path) and os.access(path, os.X_OK)):
+                missing.append(name)
+        elif name not in known and shutil.which(name) is None:
+            missing.append(name)
+    return missing
+
+
+def check_command(command: str, executor=None) -> str | None:
+    """
+    Statically checks a command before it is sent to the LLM evaluators.
+
+    Returns a precise error message when bash cannot parse the command or when it
+    calls programs that do not exist in the executor's shell session, None when
+    the command passes both checks. Lines changing PATH are not checked for
+    missing programs.
+    """
+    error = syntax_error(command)
+    if error:
+        return f"The command has a syntax error, bash -n reports: {error}"
+
+    commands = parse_command(command)
+    if commands is None or PATH_CHANGE.search(command):
+        return None
+    missing = missing_programs(commands, known_commands(executor))
+    if missing:
+        return (f"The command uses {', '.join(repr(name) for name in missing)} which is not a bash builtin, "
+                f"alias or a program installed on PATH.")
+    return None
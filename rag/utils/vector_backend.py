@@ -0,0 +1,42 @@
+from abc import ABC, abstractmethod
+
+from rag.utils.config import get_config
+
+
+class VectorBackend(ABC):
+    """Storage and nearest neighbour search for the chunks of one index."""
+
+    @abstractmethod
+    def upsert(self, ids: list[str], texts: list[str], metadatas: list[dict], vectors: list[list[float]]) -> None:
+        """Stores the chunks, replacing the chunks that already have the same id."""
+
+    @abstractmethod
+    def delete(self, ids: list[str]) -> None:
+        pass
+
+    @abstractmethod
+    def search(self, vector: list[float], k: int) -> list[tuple[str, str, dict, float]]:
+        """Returns the k closest chunks as (id, text, metadata, cosine similarity), most similar first."""
+
+    @abstractmethod
+    def chunks(self) -> list[tuple[str, str, dict]]:
+        """Returns every stored chunk as (id, text, metadata)."""
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+def get_backend(index_name: str) -> VectorBackend:
+    """Opens the VECTOR_BACKEND configured in config.yml for the given index."""
+    cfg = get_config()
+    if cfg.VECTOR_BACKEND == "embedded":
+        from rag.utils.embedded_index import EmbeddedBackend
+
+        return EmbeddedBackend(cfg.EMBEDDED_INDEX_PATH, index_name, search=cfg.EMBEDDED_SEARCH,
+                               n_probe=cfg.EMBEDDED_N_PROBE)
+    if cfg.VECTOR_BACKEND == "weaviate":
+        from rag.utils.weaviate_backend import WeaviateBackend
+
+        return WeaviateBackend(index_name)
+    raise ValueError(f"Unknown vector backend: {cfg.VECTOR_BACKEND}")
@@ -1,44 +1,183 @@
 ### Build Index
-import weaviate
-from langchain_community.document_loaders import DirectoryLoader
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_weaviate.vectorstores import WeaviateVectorStore
+import time
+import uuid
 
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+from langchain_text_splitters import CharacterTextSplitter
 
+from rag.agents.context_agent import get_document_summarizer
+from rag.utils.cache import SqliteCache
+from rag.utils.concurrency import bounded_map
+from rag.utils.config import get_config
+from rag.utils.document_loader import load_documents
 from rag.utils.embedding import get_embeddings
+from rag.utils.ingest_manifest import IngestManifest, list_files
+from rag.utils.keyword_index import BM25Index, reciprocal_rank_fusion
+from rag.utils.vector_backend import get_backend
 
 class LocalVectorStore:
-    client = weaviate.connect_to_local()
-    vector_store = None
+    def __init__(self):
+        self.backend = None
+        self.index_name = None
+        self._keyword_index = None
 
-    def ingest_fs(self, path: str):
-        loader = DirectoryLoader(path=path, glob="**/[!.]*", show_progress=True)
+    def ingest_fs(self, path: str, summarize: bool = False, incremental: bool = False):
+        """
+        Loads, splits, embeds and stores the files under path in the FolderDocs index.
 
-        documents = loader.load()
-        print(f"Loaded {len(documents)} documents.")
+        Chunks get deterministic ids derived from their source, position and content,
+        so storing them again replaces the previous objects instead of duplicating them.
+        The files and their chunk ids are recorded in the ingest manifest. In incremental
+        mode only new or modified files are embedded again, and the chunks of modified
+        or removed files are deleted from the index.
+        """
+        self.load_index("FolderDocs")
 
+        cfg = get_config()
+        manifest = IngestManifest(cfg.INGEST_MANIFEST.format(backend=cfg.VECTOR_BACKEND))
+        files = list_files(path)
+        if incremental:
+            changed, removed = manifest.diff(files)
+        else:
+            changed, removed = files, sorted(manifest.paths() - set(files))
+        print(f"Found {len(files)} files, {len(changed)} new or modified, {len(removed)} removed.")
 
-        text_splitter = CharacterTextSplitter(chunk_size=400, chunk_overlap=0)
-        docs = text_splitter.split_documents(documents)
-        #for blob in documents:
-        #    print(blob)
+        stale_ids = [chunk_id for file in changed + removed for chunk_id in manifest.chunk_ids(file)]
+        if stale_ids:
+            self.backend.delete(stale_ids)
+            print(f"Deleted {len(stale_ids)} stale chunks.")
+        for file in removed:
+            manifest.remove(file)
+        self._keyword_index = None
 
-        self.vector_store = WeaviateVectorStore.from_documents(
-            docs,
-            get_embeddings(),
-            client=self.client,
-            index_name="FolderDocs"
-        )
+        if changed:
+            documents = self._load_files(changed)
+            print(f"Loaded {len(documents)} documents.")
 
-        print("Documents have been embedded and stored in Weaviate.")
+            text_splitter = CharacterTextSplitter(chunk_size=400, chunk_overlap=0)
+            docs = text_splitter.split_documents(documents)
 
+            if summarize:
+                self.summarize(docs)
 
-    def load_index(self, index_name):
-        self.vector_store = WeaviateVectorStore(client=self.client, index_name=index_name, text_key="text", embedding=get_embeddings())
+            chunk_ids = self.chunk_ids(docs)
+            self._import(docs, chunk_ids)
+
+            ids_by_file = {file: [] for file in changed}
+            for doc, chunk_id in zip(docs, chunk_ids):
+                ids_by_file.setdefault(doc.metadata["source"], []).append(chunk_id)
+            for file in changed:
+                manifest.update(file, ids_by_file[file])
+
+        manifest.save()
+        print(f"Documents have been embedded and stored in the {cfg.VECTOR_BACKEND} index.")
+
+    def _import(self, docs, chunk_ids):
+        """Embeds the chunks through the cached embedding pipeline and writes them to the backend."""
+        embeddings = get_embeddings()
+
+        start_time = time.time()
+        vectors = embeddings.embed_documents([doc.page_content for doc in docs])
+        stats = embeddings.stats()
+        print(f"Embedded {len(docs)} chunks in {time.time() - start_time:.2f}s "
+              f"({stats['chunks_per_second']:.1f} chunks/s on cache misses, cache hit rate {stats['cache_hit_rate']:.0%}).")
+
+        self.backend.upsert(chunk_ids, [doc.page_content for doc in docs], [doc.metadata for doc in docs], vectors)
+
+    @staticmethod
+    def _load_files(files):
+        cfg = get_config()
+        cache = SqliteCache(cfg.EXTRACTED_TEXT_CACHE_PATH, table="extracted_text")
+        try:
+            return load_documents(files, cache, cfg.LOADER_WORKERS)
+        finally:
+            cache.close()
+
+    @staticmethod
+    def chunk_ids(docs):
+        """Derives a stable uuid for each chunk from its source file, its position in it and its content."""
+        positions = {}
+        chunk_ids = []
+        for doc in docs:
+            source = doc.metadata["source"]
+            position = positions.get(source, 0)
+            positions[source] = position + 1
+            chunk_ids.append(str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{position}:{doc.page_content}")))
+        return chunk_ids
 
+    @staticmethod
+    def summarize(docs):
+        """Stores a task independent summary of each chunk in its `summary` metadata property."""
+        summarizer = get_document_summarizer()
+
+        def summarize_chunk(doc):
+            generation = None
+            while not generation or not generation.summary:
+                if generation:
+                    print("Failed generation. Retrying...")
+                generation = summarizer.invoke({"document": doc.page_content})
+            return generation.summary
+
+        summaries = bounded_map(summarize_chunk, docs, get_config().INGEST_CONCURRENCY)
+        for doc, summary in zip(docs, summaries):
+            doc.metadata["summary"] = summary
+        print(f"Summarized {len(docs)} chunks.")
+
+    def load_index(self, index_name):
+        if self.backend is not None:
+            self.backend.close()
+        self.index_name = index_name
+        self.backend = get_backend(index_name)
+        self._keyword_index = None
 
     def close(self):
-        self.client.close()
+        if self.backend is not None:
+            self.backend.close()
+
+    def similarity_search(self, query: str, k: int = 4):
+        """
+        Returns the k chunks closest to the query, each with its cosine similarity
+        in `metadata["score"]`. With HYBRID_SEARCH enabled the chunks are ranked by
+        the fusion of the vector and BM25 rankings instead.
+        """
+        embedding = get_embeddings().embed_query(query)
+        if get_config().HYBRID_SEARCH:
+            results = self._hybrid_search(query, embedding, k)
+        else:
+            results = self.backend.search(embedding, k)
+        return [Document(page_content=text, metadata={**metadata, "score": score})
+                for (_, text, metadata, score) in results]
+
+    def _hybrid_search(self, query, embedding, k):
+        """
+        Fuses the vector and BM25 rankings with weighted reciprocal rank fusion, HYBRID_ALPHA
+        being the weight of the vector ranking. Chunks found by BM25 alone get their cosine
+        similarity from their (cached) embedding, so scores stay comparable for the relevance
+        prefilter.
+        """
+        cfg = get_config()
+        if self._keyword_index is None:
+            self._keyword_index = BM25Index(self.backend.chunks())
+
+        vector_results = self.backend.search(embedding, cfg.HYBRID_CANDIDATES)
+        keyword_results = self._keyword_index.search(query, cfg.HYBRID_CANDIDATES)
+        fused = reciprocal_rank_fusion([vector_results, keyword_results], [cfg.HYBRID_ALPHA, 1 - cfg.HYBRID_ALPHA],
+                                       k=cfg.HYBRID_RRF_K)[:k]
+
+        chunks = {chunk_id: (text, metadata, score) for (chunk_id, text, metadata, score) in vector_results}
+        keyword_only = [result for result in keyword_results
+                        if result[0] not in chunks and result[0] in dict(fused)]
+        if keyword_only:
+            vectors = np.asarray(get_embeddings().embed_documents([text for (_, text, _, _) in keyword_only]))
+            query_vector = np.asarray(embedding)
+            similarities = vectors @ query_vector / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector))
+            for (chunk_id, text, metadata, _), similarity in zip(keyword_only, similarities):
+                chunks[chunk_id] = (text, metadata, float(similarity))
+
+        return [(chunk_id, *chunks[chunk_id]) for chunk_id, _ in fused]
 
     def retriever(self):
-        return self.vector_store.as_retriever()
\ No newline at end of file
+        k = get_config().RETRIEVER_K
+        return RunnableLambda(lambda query: self.similarity_search(query, k))
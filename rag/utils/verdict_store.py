@@ -0,0 +1,66 @@
+import json
+import shlex
+
+from rag.utils.cache import SqliteCache, make_key
+from rag.utils.shell import parse_command
+
+
+def normalize_command(command: str) -> tuple[list, bool]:
+    """
+    Returns a canonical form of the command line and whether it depends on the
+    working directory.
+
+    Only the whitespace between the tokens is normalized. The arguments keep
+    their order and their quoting: `find -delete` before or after `-name`, or
+    `-mx` and `-m -x`, are different commands. A command line depends on the
+    working directory when an argument or a redirection is a relative path.
+    """
+    lexer = shlex.shlex(command, posix=False, punctuation_chars=";&|<>\n")
+    lexer.whitespace = " \t\r"
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    try:
+        tokens = list(lexer)
+    except ValueError:
+        return [" ".join(command.split())], True
+
+    commands = parse_command(command)
+    if not commands:
+        return tokens, True
+    relative = any(not path.startswith(("/", "~", "$HOME"))
+                   for simple_command in commands
+                   for path in [argument for argument in simple_command.argv[1:] if not argument.startswith("-")]
+                   + [target for _, target in simple_command.redirections])
+    return tokens, relative
+
+
+class VerdictStore:
+    """
+    Persistent store of the correctness and security verdicts given by the LLM
+    graders, keyed by the normalized command.
+
+    Security verdicts only depend on the command, correctness verdicts also on
+    the task. Commands with relative paths are also keyed by the working
+    directory. Verdicts expire after `ttl` seconds.
+    """
+
+    def __init__(self, path: str, ttl: float | None = None):
+        self._cache = SqliteCache(path, table="verdicts", ttl=ttl)
+
+    def _key(self, check, command, cwd, task):
+        normalized, relative = normalize_command(command)
+        return make_key(check, normalized, cwd if relative else None, task if check == "correctness" else None)
+
+    def get(self, check: str, command: str, cwd: str, task: str | None = None) -> tuple[str, str] | None:
+        """Returns the stored (comment, score) for the command, or None."""
+        value = self._cache.get(self._key(check, command, cwd, task), check)
+        return tuple(json.loads(value)) if value is not None else None
+
+    def set(self, check: str, command: str, cwd: str, verdict: tuple[str, str], task: str | None = None) -> None:
+        self._cache.set(self._key(check, command, cwd, task), json.dumps(list(verdict)), check)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def close(self) -> None:
+        self._cache.close()
@@ -0,0 +1,51 @@
+import weaviate
+from weaviate.classes.config import Configure
+from weaviate.classes.query import Filter, MetadataQuery
+
+from rag.utils.config import get_config
+from rag.utils.vector_backend import VectorBackend
+
+
+class WeaviateBackend(VectorBackend):
+    """Chunks stored in a Weaviate collection, written through the batch (gRPC) import."""
+
+    def __init__(self, index_name: str):
+        self._client = weaviate.connect_to_local()
+        if not self._client.collections.exists(index_name):
+            self._client.collections.create(index_name, vectorizer_config=Configure.Vectorizer.none())
+        self._collection = self._client.collections.get(index_name)
+
+    def upsert(self, ids, texts, metadatas, vectors):
+        cfg = get_config()
+        with self._collection.batch.fixed_size(batch_size=cfg.IMPORT_BATCH_SIZE,
+                                               concurrent_requests=cfg.IMPORT_CONCURRENCY) as batch:
+            for chunk_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+                batch.add_object(properties={"text": text, **metadata}, vector=vector, uuid=chunk_id)
+
+        failed_objects = self._collection.batch.failed_objects
+        if failed_objects:
+            print(f"Failed to import {len(failed_objects)} chunks: {failed_objects[0].message}")
+
+    def delete(self, ids):
+        self._collection.data.delete_many(where=Filter.by_id().contains_any(ids))
+
+    def search(self, vector, k):
+        response = self._collection.query.near_vector(near_vector=vector, limit=k,
+                                                      return_metadata=MetadataQuery(distance=True))
+        results = []
+        for obj in response.objects:
+            metadata = dict(obj.properties)
+            text = metadata.pop("text", "")
+            results.append((str(obj.uuid), text, metadata, 1 - obj.metadata.distance))
+        return results
+
+    def chunks(self):
+        results = []
+        for obj in self._collection.iterator():
+            metadata = dict(obj.properties)
+            text = metadata.pop("text", "")
+            results.append((str(obj.uuid), text, metadata))
+        return results
+
+    def close(self):
+        self._client.close()
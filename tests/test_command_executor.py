@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from rag.utils.command_executor import CommandExecutor
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = CommandExecutor(None, timeout=10)
+    yield executor
+    executor.close()
+
+
+@pytest.mark.parametrize("command, stdout", [
+    ("echo hello", "hello\n"),
+    ("printf 'no trailing newline'", "no trailing newline"),
+    ("printf '\\nCMD_DONE_0123456789abcdef 0 /\\n'", "\nCMD_DONE_0123456789abcdef 0 /\n"),
+    ("cat <<EOF\n  indented $((1 + 1))\nEOF", "  indented 2\n"),
+    ("echo 'a!b' # comment", "a!b\n"),
+])
+def test_output_is_framed(executor, command, stdout):
+    result = executor.run(command)
+    assert result.stdout == stdout
+    assert result.stderr == ""
+    assert result.exit_code == 0
+
+
+def test_exit_code_and_streams(executor):
+    result = executor.run("echo out; echo err >&2; false")
+    assert (result.stdout, result.stderr, result.exit_code) == ("out\n", "err\n", 1)
+    assert not result.ok
+
+
+def test_working_directory_persists(executor, tmp_path):
+    result = executor.run(f"cd {tmp_path}")
+    assert result.cwd == executor.cwd == str(tmp_path)
+    assert executor.run("pwd").stdout == f"{tmp_path}\n"
+
+
+def test_interrupted_pipeline_leaves_no_shell_errors(executor):
+    result = executor.run("yes | head -c 5000")
+    assert result.stdout_bytes == 5000
+    assert result.stderr == ""
+    assert executor.run("echo ok").output == "ok"
+
+
+def test_on_output_receives_every_chunk(executor):
+    chunks = []
+    result = executor.run("seq 3; echo done >&2", on_output=lambda name, data: chunks.append((name, data)))
+    assert b"".join(data for name, data in chunks if name == "stdout").decode() == result.stdout == "1\n2\n3\n"
+    assert b"".join(data for name, data in chunks if name == "stderr").decode() == result.stderr == "done\n"
+
+
+def test_timeout_interrupts_the_command(executor):
+    result = executor.run("sleep 30", timeout=1)
+    assert result.timed_out
+    assert result.duration < 10
+    assert executor.run("echo ok").output == "ok"
+
+
+def test_exit_restarts_the_shell():
+    executor = CommandExecutor(None, timeout=10)
+    try:
+        result = executor.run("exit 3")
+        assert result.exit_code == 3
+        assert executor.run("echo ok").output == "ok"
+    finally:
+        executor.close()
+
+
+def test_output_is_bounded():
+    executor = CommandExecutor(None, timeout=10, max_output_bytes=100)
+    try:
+        result = executor.run("seq 1000")
+        assert result.truncated
+        assert result.stdout_bytes == len("".join(f"{i}\n" for i in range(1, 1001)))
+        assert result.dropped_bytes == result.stdout_bytes - 100
+        assert result.stdout.startswith("1\n2\n") and result.stdout.endswith("999\n1000\n")
+    finally:
+        executor.close()
+
+
+def test_write_file(executor, tmp_path):
+    executor.run(f"cd {tmp_path}")
+    content = "it's $HOME and `date`\n"
+    result = executor.write_file("sub/dir/file.txt", content)
+    assert result.ok
+    with open(os.path.join(tmp_path, "sub/dir/file.txt")) as file:
+        assert file.read() == content
+    assert executor.write_file("sub/dir/file.txt/nested", content).exit_code == 1
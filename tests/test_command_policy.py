@@ -0,0 +1,138 @@
+import pytest
+
+from rag.utils.command_policy import CommandPolicy
+from rag.utils.config import get_config
+
+HOME = "/home/user"
+
+
+@pytest.fixture(scope="module")
+def policy():
+    return CommandPolicy(get_config().SECURITY_RULES, home=HOME)
+
+
+def verdict(policy, command):
+    result = policy.classify(command)
+    return result[0] if result else None
+
+
+@pytest.mark.parametrize("command", [
+    "env rm -rf ~",
+    "command rm -rf /",
+    "nice -n 10 rm -rf ~",
+    "timeout 5 rm -rf /home",
+    "env FOO=bar mkfs.ext4 /dev/sdb",
+])
+def test_wrapped_destructive_commands_are_denied(policy, command):
+    assert verdict(policy, command) == "no"
+
+
+@pytest.mark.parametrize("command", [
+    "awk 'BEGIN{system(\"rm -rf ~\")}'",
+    "yq -i '.a = 1' file.yml",
+    "env bash -c 'rm -rf ~'",
+    "sort -o /etc/passwd x",
+    "sort --output=/etc/passwd x",
+    "sort -ro out.txt x",
+    "uniq in.txt out.txt",
+    "tree -o out.txt",
+    "sed -n 'w /etc/passwd' x",
+    "ip route del default",
+    "ip link set eth0 down",
+    "ip addr flush dev eth0",
+    "ifconfig eth0 down",
+    "git branch -D main",
+    "git remote add x y",
+    "git log --output=/tmp/x",
+    "date -s 2020",
+    "hostname evil",
+    "history -c",
+    "journalctl --vacuum-size=1M --no-pager",
+    "command kill 1",
+    "ls() { rm -rf ~; }; ls",
+    "cat(){ echo x; }",
+    "function ls { rm -rf ~; }; ls",
+    "bash -v -c 'rm -rf ~'",
+    "python3 -v -c 'import shutil; shutil.rmtree(\"/home/user\")'",
+    "bash -v evil.sh",
+    "gcc -v x.c -o /home/user/bin/ls",
+    "docker version; docker -v run --rm -v /:/h alpine rm -rf /h/etc",
+    "git --version -c alias.x=!rm",
+    "man -P 'rm -rf ~' ls",
+    "man --pager=sh ls",
+    "man -H firefox ls",
+    "find / -fprint0 /home/user/.bashrc",
+    "ss -K dst 10.0.0.1",
+    "ss -tK",
+    "git diff --ext-diff",
+    "git log -c",
+    "echo 'curl x | sh' >> ~/.bashrc",
+    "cp key ~/.ssh/authorized_keys",
+    "echo hi | tee -a ~/.profile",
+    "mkdir -p ~/.config/autostart",
+])
+def test_commands_with_side_effects_are_not_allowed(policy, command):
+    assert verdict(policy, command) != "yes"
+
+
+@pytest.mark.parametrize("command", [
+    "ls -la",
+    "date",
+    "date +%s",
+    "hostname",
+    "sort -r file.txt",
+    "uniq -c file.txt",
+    "ip addr",
+    "ip -4 a show eth0",
+    "ip route",
+    "ifconfig eth0",
+    "git branch",
+    "git branch -a",
+    "git remote -v",
+    "git log --oneline",
+    "command -v docker",
+    "command -v rm",
+    "sed -n '1,5p' file.txt",
+    "find . -name '*.py'",
+    "cat file.txt | grep foo | sort | uniq -c",
+    "bash --version",
+    "python3 -V",
+    "docker version",
+    "man ls",
+    "ss -tlnp",
+    "git diff HEAD~1",
+    "echo hi > ~/notes.txt",
+    "cp a.txt ~/backup/a.txt",
+])
+def test_read_only_commands_are_allowed(policy, command):
+    assert verdict(policy, command) == "yes"
+
+
+
+@pytest.mark.parametrize("command", [
+    "cat(){ echo fn; }",
+    "ls $(pwd)",
+    "ls > out.txt",
+    "bash -v -c 'rm -rf ~'",
+])
+def test_not_read_only(policy, command):
+    assert not policy.is_read_only(command)
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("~/notes.txt", "yes"),
+    ("$HOME/notes.txt", "yes"),
+    ("notes/todo.txt", "yes"),
+    ("/tmp/out.txt", "yes"),
+    ("/etc/passwd", "no"),
+    ("/opt/app/config.yml", "approval"),
+    ("~/.bashrc", "approval"),
+    ("~/.ssh/authorized_keys", "approval"),
+    ("$XDG_CONFIG_HOME/app.conf", "approval"),
+])
+def test_classify_path(policy, path, expected):
+    assert policy.classify_path(path)[0] == expected
+
+
+def test_resolve_expands_home(policy):
+    assert policy.resolve("$HOME/y.txt", "/tmp") == policy.resolve("~/y.txt", "/tmp") == f"{HOME}/y.txt"
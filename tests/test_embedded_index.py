@@ -0,0 +1,70 @@
+import os
+import sqlite3
+
+import numpy as np
+
+from rag.utils.embedded_index import EmbeddedBackend
+
+
+def vectors(count, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).tolist()
+
+
+def upsert(backend, ids, seed=0):
+    backend.upsert(ids, [f"text {chunk_id}" for chunk_id in ids], [{"source": chunk_id} for chunk_id in ids],
+                   vectors(len(ids), seed=seed))
+
+
+def test_deleted_rows_are_reused(tmp_path):
+    backend = EmbeddedBackend(str(tmp_path), "index")
+    vectors_path = tmp_path / "index.f32"
+    for generation in range(5):
+        ids = [f"{generation}-{i}" for i in range(10)]
+        upsert(backend, ids, seed=generation)
+        assert os.path.getsize(vectors_path) == 10 * 8 * 4
+        assert len(backend.chunks()) == 10
+        backend.delete(ids)
+    assert backend.chunks() == []
+    backend.close()
+
+
+def test_search_after_reuse(tmp_path):
+    backend = EmbeddedBackend(str(tmp_path), "index")
+    upsert(backend, ["a", "b", "c"])
+    backend.delete(["b"])
+    backend.upsert(["d"], ["text d"], [{}], [[1.0] + [0.0] * 7])
+    (chunk_id, text, _, score), *_ = backend.search([1.0] + [0.0] * 7, 3)
+    assert (chunk_id, text) == ("d", "text d") and score > 0.99
+    assert {chunk_id for chunk_id, *_ in backend.search([1.0] + [0.0] * 7, 10)} == {"a", "c", "d"}
+    backend.close()
+
+
+def test_free_rows_survive_reopening(tmp_path):
+    backend = EmbeddedBackend(str(tmp_path), "index")
+    upsert(backend, ["a", "b", "c"])
+    backend.delete(["a", "b"])
+    backend.close()
+
+    backend = EmbeddedBackend(str(tmp_path), "index")
+    upsert(backend, ["d", "e"], seed=1)
+    assert os.path.getsize(tmp_path / "index.f32") == 3 * 8 * 4
+    assert sorted(chunk_id for chunk_id, *_ in backend.chunks()) == ["c", "d", "e"]
+    backend.close()
+
+
+def test_holes_of_older_indexes_are_recorded(tmp_path):
+    backend = EmbeddedBackend(str(tmp_path), "index")
+    upsert(backend, ["a", "b", "c"])
+    backend.delete(["a"])
+    backend.close()
+    # An index written before the free list
+    connection = sqlite3.connect(tmp_path / "index.sqlite")
+    connection.execute("DROP TABLE free_rows")
+    connection.execute("DELETE FROM meta WHERE key = 'free_rows'")
+    connection.commit()
+    connection.close()
+
+    backend = EmbeddedBackend(str(tmp_path), "index")
+    upsert(backend, ["d"], seed=1)
+    assert os.path.getsize(tmp_path / "index.f32") == 3 * 8 * 4
+    backend.close()
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from rag.utils.output_parsers import find_parser, parse_output
+
+LS_LONG = """total 12
+drwxr-xr-x 2 user user 4096 Jan  3 10:00 docs
+-rw-r--r-- 1 user user  120 Jan  3 10:01 notes.txt
+lrwxrwxrwx 1 user user    9 Jan  3 10:02 latest -> notes.txt
+"""
+LS_LONG_HUMAN = """total 8.0K
+drwxr-xr-x 2 user user 4.0K Jan  3 10:00 docs
+-rw-r--r-- 1 user user    0 Jan  3 10:01 empty.txt
+"""
+DF_HUMAN = """Filesystem      Size  Used Avail Use% Mounted on
+/dev/sda1        20G  3.0G   17G  16% /
+tmpfs           3.0G     0  3.0G   0% /dev/shm
+"""
+
+
+def rows(command, output, max_chars=None):
+    parsed = parse_output(command, output, max_chars)
+    return json.loads(parsed) if parsed is not None else None
+
+
+def test_ls_long():
+    entries = rows("ls -la", LS_LONG)
+    assert [entry["name"] for entry in entries] == ["docs", "notes.txt", "latest"]
+    assert entries[0]["type"] == "directory" and entries[0]["size"] == 4096
+    assert entries[2]["target"] == "notes.txt"
+
+
+def test_ls_long_human_sizes_are_all_strings():
+    assert [entry["size"] for entry in rows("ls -lh", LS_LONG_HUMAN)] == ["4.0K", "0"]
+
+
+def test_ls_recursive_sections():
+    entries = rows("ls -R", ".:\na\nsub\n\n./sub:\nb\n")
+    assert entries == [{"name": "a", "directory": "."}, {"name": "sub", "directory": "."},
+                       {"name": "b", "directory": "./sub"}]
+
+
+@pytest.mark.parametrize("command", ["ls -m", "ls -C", "ls -x", "ls -lm", "ls -l | wc -l", "ls $HOME", "sudo ls"])
+def test_no_parser(command):
+    assert find_parser(command) is None
+
+
+def test_df_columns_have_one_type():
+    entries = rows("df -h", DF_HUMAN)
+    assert [entry["used"] for entry in entries] == ["3.0G", "0"]
+    entries = rows("df", "Filesystem 1K-blocks Used Available Use% Mounted on\n/dev/sda1 100 0 100 0% /\n")
+    assert entries[0]["used"] == 0 and entries[0]["1k-blocks"] == 100
+
+
+def test_unexpected_output_is_not_parsed():
+    assert parse_output("ls -l", "ls: cannot access 'x': No such file or directory\n") is None
+    assert parse_output("whoami", "a\nb\n") is None
+
+
+def test_rows_over_budget_are_left_to_the_analyser():
+    output = "".join(f"file{i}.txt\n" for i in range(500))
+    assert parse_output("ls", output) is not None
+    assert parse_output("ls", output, max_chars=2000) is None
@@ -0,0 +1,33 @@
+from rag.utils.output_reducer import compact_lines, reduce_output
+
+COMPOSE = 'services:\n  db:\n    ports:\n      - "5432:5432"\n  web:\n    ports:\n      - "80:80"\n'
+
+
+def test_output_under_budget_is_unchanged():
+    reduction = reduce_output(COMPOSE, "ports", 12000)
+    assert reduction.text == COMPOSE
+    assert reduction.output_bytes == reduction.input_bytes
+
+
+def test_short_runs_of_similar_lines_are_kept():
+    lines = ["letter1.txt", "letter2.txt", "letter3.txt"]
+    assert compact_lines(lines) == (lines, 0, 0)
+
+
+def test_long_runs_of_similar_lines_are_collapsed():
+    lines, _, collapsed = compact_lines([f"request {i} ok" for i in range(10)] + ["done"])
+    assert lines == ["request 0 ok", "[... 9 similar lines]", "done"]
+    assert collapsed == 9
+
+
+def test_output_over_budget_keeps_errors():
+    output = "\n".join(f"2024-01-01 INFO request {i} served in {i % 7}ms by worker {i % 3}" for i in range(5000))
+    reduction = reduce_output(output + "\nERROR disk full", "disk", 2000)
+    assert len(reduction.text) <= 2000
+    assert "ERROR disk full" in reduction.text
+
+
+def test_markers_count_in_the_budget():
+    output = "\n".join(f"line {i} " + "x" * (i % 37) + (" error" if i % 11 == 0 else "") for i in range(3000))
+    for max_chars in (500, 2000, 12000):
+        assert len(reduce_output(output, "error", max_chars).text) <= max_chars
@@ -0,0 +1,53 @@
+import pytest
+
+from rag.utils.command_executor import CommandExecutor
+from rag.utils.shell import check_command, parse_command
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = CommandExecutor(None)
+    yield executor
+    executor.close()
+
+
+@pytest.mark.parametrize("command", [
+    "which nosuchprogram42 && nosuchprogram42 ps || echo nosuchprogram42 is not installed",
+    "command -v nosuchprogram42 >/dev/null && nosuchprogram42 --version",
+    "if type nosuchprogram42; then nosuchprogram42 --version; fi",
+    "sudo apt-get install -y nosuchprogram42 && nosuchprogram42 --version",
+    "pip install nosuchprogram42; nosuchprogram42 --help",
+    "curl -fsSL https://example.com/install.sh | sh && nosuchprogram42 --version",
+    "npm i -g nosuchprogram42 && nosuchprogram42",
+    "nosuchprogram42() { echo hi; }; nosuchprogram42",
+    "function nosuchprogram42 { echo hi; }; nosuchprogram42",
+    "alias nosuchprogram42='ls -l'; nosuchprogram42",
+    "export PATH=$PATH:~/bin && nosuchprogram42",
+    "source ~/.nvm/nvm.sh && nosuchprogram42 install 20",
+])
+def test_guarded_and_installed_programs_are_not_missing(executor, command):
+    assert check_command(command, executor) is None
+
+
+@pytest.mark.parametrize("command", [
+    "nosuchprogram42 --version",
+    "ls && nosuchprogram42 ps",
+    "which docker && nosuchprogram42 ps",
+])
+def test_missing_programs_are_reported(executor, command):
+    assert "nosuchprogram42" in check_command(command, executor)
+
+
+def test_syntax_errors_are_reported():
+    assert "syntax error" in check_command("if true; then echo x")
+
+
+def test_sudo_is_stripped():
+    (simple_command,) = parse_command("sudo -u root ls -l")
+    assert simple_command.sudo and simple_command.argv == ["ls", "-l"]
+
+
+def test_programs_are_looked_up_in_the_session(executor):
+    assert "nosuchprogram43" in check_command("nosuchprogram43", executor)
+    executor.run("nosuchprogram43() { echo hi; }")
+    assert check_command("nosuchprogram43", executor) is None
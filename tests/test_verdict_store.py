@@ -0,0 +1,45 @@
+import pytest
+
+from rag.utils.verdict_store import VerdictStore, normalize_command
+
+
+@pytest.mark.parametrize("first, second", [
+    ('find ~/tmp -name "*.log" -print -delete', 'find ~/tmp -delete -name "*.log" -print'),
+    ("git commit -mx", "git commit -m -x"),
+    ("ls -la", "ls -al"),
+    ("tar -czf a.tgz dir", "tar -zcf a.tgz dir"),
+    ("echo ~", 'echo "~"'),
+    ("rsync -a src/ dst", "rsync -a src dst"),
+    ("sudo -u postgres psql", "sudo psql"),
+    ("echo 'a  b'", "echo 'a b'"),
+])
+def test_different_commands_have_different_keys(first, second):
+    assert normalize_command(first)[0] != normalize_command(second)[0]
+
+
+@pytest.mark.parametrize("first, second", [
+    ("ls  -la   /tmp", "ls -la /tmp"),
+    ("cat a.txt|grep x", "cat a.txt | grep x"),
+    ("echo hi >> out.txt", "echo hi >>out.txt"),
+])
+def test_whitespace_is_normalized(first, second):
+    assert normalize_command(first)[0] == normalize_command(second)[0]
+
+
+@pytest.mark.parametrize("command, relative", [
+    ("ls -la /tmp", False),
+    ("cat ~/notes.txt", False),
+    ("cat notes.txt", True),
+    ("echo hi > out.txt", True),
+])
+def test_relative_paths(command, relative):
+    assert normalize_command(command)[1] == relative
+
+
+def test_verdicts_are_keyed_by_cwd_for_relative_commands(tmp_path):
+    store = VerdictStore(str(tmp_path / "verdicts.sqlite"))
+    store.set("security", "rm notes.txt", "/home/user", ("Removes a file", "yes"))
+    assert store.get("security", "rm  notes.txt", "/home/user") == ("Removes a file", "yes")
+    assert store.get("security", "rm notes.txt", "/etc") is None
+    assert store.get("security", 'find . -delete -name "*.log"', "/home/user") is None
+    store.close()